@@ -26,7 +26,8 @@ function DashboardContent() {
             adminApi.getProducts(token),
             adminApi.getAllOrders(token),
             adminApi.getOrderStats(token),
-        ]).then(([products, orders, orderStats]) => {
+        ]).then(([products, orderPage, orderStats]) => {
+            const orders = orderPage?.orders;
             const productCount = products?.total || (products?.products?.length ?? 0);
             setStats({
                 products: productCount,
@@ -111,7 +112,7 @@ function DashboardContent() {
                                                 >
                                                     <td style={{ padding: '16px 20px', fontWeight: '700', fontSize: '0.875rem' }}>{order.order_number}</td>
                                                     <td style={{ padding: '16px 20px', fontSize: '0.875rem', color: '#6b7280' }}>{new Date(order.created_at).toLocaleDateString('en-GB')}</td>
-                                                    <td style={{ padding: '16px 20px', fontSize: '0.875rem', color: '#374151' }}>{order.items?.length} items</td>
+                                                    <td style={{ padding: '16px 20px', fontSize: '0.875rem', color: '#374151' }}>{order.item_count} items</td>
                                                     <td style={{ padding: '16px 20px', fontWeight: '700', fontSize: '0.9rem' }}>${order.total.toFixed(2)}</td>
                                                     <td style={{ padding: '16px 20px' }}>
                                                         <span style={{ padding: '4px 12px', borderRadius: '99px', fontSize: '0.75rem', fontWeight: '700', backgroundColor: statusColors[order.status] + '20', color: statusColors[order.status] }}>
@@ -21,10 +21,15 @@ function OrdersContent() {
     const [filterStatus, setFilterStatus] = useState('all');
     const [search, setSearch] = useState('');
     const [expanded, setExpanded] = useState<number | null>(null);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    // Store-wide counts and revenue; the loaded pages are only the newest orders
+    const [stats, setStats] = useState<any | null>(null);
 
     useEffect(() => {
         if (!token) { router.push('/admin/login'); return; }
         fetchOrders();
+        fetchStats();
     }, [token]);
 
     useEffect(() => {
@@ -36,8 +41,9 @@ function OrdersContent() {
 
     const fetchOrders = async () => {
         try {
-            const data = await adminApi.getAllOrders(token!);
-            setOrders(Array.isArray(data) ? data : []);
+            const page = await adminApi.getAllOrders(token!);
+            setOrders(Array.isArray(page.orders) ? page.orders : []);
+            setNextCursor(page.nextCursor);
         } catch (e) {
             console.error(e);
         } finally {
@@ -45,11 +51,48 @@ function OrdersContent() {
         }
     };
 
+    const fetchStats = async () => {
+        try {
+            setStats(await adminApi.getOrderStats(token!));
+        } catch (e) {
+            console.error(e);
+        }
+    };
+
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const page = await adminApi.getAllOrders(token!, nextCursor);
+            setOrders(prev => [...prev, ...page.orders]);
+            setNextCursor(page.nextCursor);
+        } catch (e) {
+            console.error(e);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    const toggle = async (order: any) => {
+        if (expanded === order.id) { setExpanded(null); return; }
+        setExpanded(order.id);
+        // The list only carries summaries; line items are loaded on first expand
+        if (!order.items) {
+            try {
+                const detail = await adminApi.getOrder(token!, order.id);
+                setOrders(prev => prev.map(o => o.id === order.id ? { ...o, items: detail.items } : o));
+            } catch (e) {
+                console.error(e);
+            }
+        }
+    };
+
     const updateStatus = async (orderId: number, status: string) => {
         setUpdating(orderId);
         try {
             await adminApi.updateOrderStatus(token!, orderId, status);
             setOrders(prev => prev.map(o => o.id === orderId ? { ...o, status } : o));
+            fetchStats();
         } catch (e: any) {
             alert(e?.detail || 'Failed to update');
         } finally {
@@ -57,8 +100,7 @@ function OrdersContent() {
         }
     };
 
-    const counts = STATUS_OPTIONS.reduce((acc, s) => ({ ...acc, [s]: orders.filter(o => o.status === s).length }), {} as Record<string, number>);
-    const totalRevenue = orders.filter(o => o.status === 'delivered').reduce((a, o) => a + o.total, 0);
+    const count = (key: string) => stats ? stats[key] : '…';
 
     return (
         <div style={{ display: 'flex', height: '100vh', overflow: 'hidden' }}>
@@ -66,17 +108,17 @@ function OrdersContent() {
             <main style={{ flex: 1, overflowY: 'auto', padding: '32px' }}>
                 <div style={{ marginBottom: '28px' }}>
                     <h1 style={{ fontSize: '1.75rem', fontWeight: '900', color: '#111827' }}>Order Management</h1>
-                    <p style={{ color: '#6b7280', marginTop: '4px' }}>{orders.length} total orders · ${totalRevenue.toFixed(2)} revenue from delivered</p>
+                    <p style={{ color: '#6b7280', marginTop: '4px' }}>{count('total')} orders · ${stats ? stats.revenue.toFixed(2) : '…'} revenue from delivered · {orders.length} loaded</p>
                 </div>
 
                 {/* Status pills */}
                 <div style={{ display: 'flex', gap: '8px', marginBottom: '20px', flexWrap: 'wrap' }}>
                     <button onClick={() => setFilterStatus('all')} style={{ padding: '8px 16px', borderRadius: '99px', border: '2px solid ' + (filterStatus === 'all' ? '#2563eb' : '#e5e7eb'), backgroundColor: filterStatus === 'all' ? '#eff6ff' : 'white', color: filterStatus === 'all' ? '#2563eb' : '#4b5563', fontWeight: '600', fontSize: '0.85rem', cursor: 'pointer' }}>
-                        All ({orders.length})
+                        All ({count('total')})
                     </button>
                     {STATUS_OPTIONS.map(s => (
                         <button key={s} onClick={() => setFilterStatus(s)} style={{ padding: '8px 16px', borderRadius: '99px', border: '2px solid ' + (filterStatus === s ? STATUS_COLORS[s] : '#e5e7eb'), backgroundColor: filterStatus === s ? STATUS_COLORS[s] + '15' : 'white', color: filterStatus === s ? STATUS_COLORS[s] : '#4b5563', fontWeight: '600', fontSize: '0.85rem', cursor: 'pointer', textTransform: 'capitalize' }}>
-                            {s} ({counts[s] || 0})
+                            {s} ({count(s)})
                         </button>
                     ))}
                 </div>
@@ -113,14 +155,14 @@ function OrdersContent() {
                                                 onMouseLeave={e => (e.currentTarget as HTMLTableRowElement).style.backgroundColor = ''}
                                             >
                                                 <td style={{ padding: '14px 16px' }}>
-                                                    <button onClick={() => setExpanded(expanded === order.id ? null : order.id)} style={{ background: 'none', border: 'none', cursor: 'pointer', fontSize: '0.9rem', color: '#6b7280' }}>
+                                                    <button onClick={() => toggle(order)} style={{ background: 'none', border: 'none', cursor: 'pointer', fontSize: '0.9rem', color: '#6b7280' }}>
                                                         {expanded === order.id ? '▾' : '▸'}
                                                     </button>
                                                 </td>
                                                 <td style={{ padding: '14px 16px', fontWeight: '700', fontSize: '0.875rem' }}>{order.order_number}</td>
                                                 <td style={{ padding: '14px 16px', fontSize: '0.85rem', color: '#6b7280' }}>{new Date(order.created_at).toLocaleDateString('en-GB')}</td>
                                                 <td style={{ padding: '14px 16px', fontSize: '0.85rem', color: '#374151', maxWidth: '160px', overflow: 'hidden', textOverflow: 'ellipsis', whiteSpace: 'nowrap' }}>{order.shipping_address?.split(',')[0]}</td>
-                                                <td style={{ padding: '14px 16px', fontSize: '0.85rem', color: '#374151' }}>{order.items?.length} items</td>
+                                                <td style={{ padding: '14px 16px', fontSize: '0.85rem', color: '#374151' }}>{order.item_count} items</td>
                                                 <td style={{ padding: '14px 16px', fontWeight: '700' }}>${order.total.toFixed(2)}</td>
                                                 <td style={{ padding: '14px 16px' }}>
                                                     <span style={{ padding: '4px 12px', borderRadius: '99px', fontSize: '0.75rem', fontWeight: '700', backgroundColor: STATUS_COLORS[order.status] + '18', color: STATUS_COLORS[order.status], textTransform: 'capitalize' }}>
@@ -171,6 +213,17 @@ function OrdersContent() {
                         )}
                     </div>
                 )}
+                {!loading && nextCursor && (
+                    <div style={{ textAlign: 'center', marginTop: '24px' }}>
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            style={{ padding: '10px 24px', backgroundColor: 'white', color: '#374151', border: '1px solid #e5e7eb', borderRadius: '8px', fontWeight: '700', cursor: 'pointer', opacity: loadingMore ? 0.7 : 1 }}
+                        >
+                            {loadingMore ? 'Loading...' : 'Load older orders'}
+                        </button>
+                    </div>
+                )}
             </main>
         </div>
     );
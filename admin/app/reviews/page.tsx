@@ -12,6 +12,8 @@ function ReviewsContent() {
     const [reviews, setReviews] = useState<any[]>([]);
     const [loading, setLoading] = useState(true);
     const [filter, setFilter] = useState('pending');
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     useEffect(() => {
         if (!token) { router.push('/admin/login'); return; }
@@ -21,8 +23,9 @@ function ReviewsContent() {
     const fetchReviews = async () => {
         setLoading(true);
         try {
-            const data = await adminApi.getAdminReviews(token!, filter);
-            setReviews(data);
+            const page = await adminApi.getAdminReviews(token!, filter);
+            setReviews(page.reviews);
+            setNextCursor(page.nextCursor);
         } catch (err) {
             console.error(err);
         } finally {
@@ -30,6 +33,20 @@ function ReviewsContent() {
         }
     };
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const page = await adminApi.getAdminReviews(token!, filter, nextCursor);
+            setReviews(prev => [...prev, ...page.reviews]);
+            setNextCursor(page.nextCursor);
+        } catch (err) {
+            console.error(err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleModerate = async (id: number, status: string) => {
         try {
             await adminApi.moderateReview(token!, id, status);
@@ -113,6 +130,18 @@ function ReviewsContent() {
                         </table>
                     )}
                 </div>
+
+                {!loading && nextCursor && (
+                    <div style={{ textAlign: 'center', marginTop: '24px' }}>
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            style={{ padding: '10px 24px', backgroundColor: 'white', color: '#374151', border: '1px solid #e5e7eb', borderRadius: '8px', fontWeight: '700', cursor: 'pointer', opacity: loadingMore ? 0.7 : 1 }}
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </main>
         </div>
     );
@@ -81,8 +81,18 @@ export const adminApi = {
         return res.json();
     },
 
-    async getAllOrders(token: string) {
-        const res = await fetch(`${getBaseUrl()}/orders/admin/all`, {
+    async getAllOrders(token: string, cursor?: string | null) {
+        const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+        const res = await fetch(`${getBaseUrl()}/orders/admin/all${query}`, {
+            headers: { 'Authorization': `Bearer ${token}` },
+        });
+        if (!res.ok) throw await res.json();
+        // The next page's cursor comes back in a header; null on the last page
+        return { orders: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') };
+    },
+
+    async getOrder(token: string, orderId: number) {
+        const res = await fetch(`${getBaseUrl()}/orders/admin/${orderId}`, {
             headers: { 'Authorization': `Bearer ${token}` },
         });
         if (!res.ok) throw await res.json();
@@ -135,13 +145,16 @@ export const adminApi = {
     },
 
     // Reviews
-    async getAdminReviews(token: string, status?: string) {
-        const query = status ? `?status=${status}` : '';
-        const res = await fetch(`${getBaseUrl()}/reviews/admin/all${query}`, {
+    async getAdminReviews(token: string, status?: string, cursor?: string | null) {
+        const query = new URLSearchParams();
+        if (status) query.set('status', status);
+        if (cursor) query.set('cursor', cursor);
+        const res = await fetch(`${getBaseUrl()}/reviews/admin/all?${query}`, {
             headers: { 'Authorization': `Bearer ${token}` },
         });
         if (!res.ok) throw await res.json();
-        return res.json();
+        // The next page's cursor comes back in a header; null on the last page
+        return { reviews: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') };
     },
 
     async moderateReview(token: string, id: number, status: string) {
@@ -0,0 +1,88 @@
+"""Login load test: N concurrent logins against the real app, with /health probed throughout.
+
+Reports login p50/p99 and the latency of /health while bcrypt is busy; with hashing
+on the thread pool the event loop stays free, so /health should stay in the low
+milliseconds. --inline runs bcrypt on the event loop for comparison. A throwaway
+user is created and removed again, so any database with the auth tables will do:
+
+Usage: DATABASE_URL=postgresql://.../bench SLOW_QUERY_MS=600000 \
+           python -m auth_service.load_test [--logins 50] [--inline]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+from shared.auth_middleware import get_password_hash, verify_password
+from shared.database import SessionLocal
+from . import models, routes
+from .main import app
+
+PASSWORD = "load-test-password"
+
+def _percentiles(timings: list) -> str:
+    timings = sorted(timings)
+    p99 = timings[max(0, round(len(timings) * 0.99) - 1)]
+    return f"p50 {statistics.median(timings):7.1f} ms  p99 {p99:7.1f} ms  max {timings[-1]:7.1f} ms"
+
+async def _verify_inline(plain_password: str, hashed_password: str) -> bool:
+    return verify_password(plain_password, hashed_password)
+
+async def run(client: httpx.AsyncClient, email: str, logins: int) -> tuple:
+    """Fire `logins` concurrent logins while polling /health; returns (status codes, login ms, health ms, elapsed s)"""
+    health, done = [], asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/health")
+            health.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.01)
+
+    async def login():
+        start = time.perf_counter()
+        response = await client.post("/login", json={"email": email, "password": PASSWORD})
+        return response.status_code, (time.perf_counter() - start) * 1000
+
+    prober = asyncio.create_task(probe())
+    start = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await prober
+    return [code for code, _ in results], [ms for _, ms in results], health, elapsed
+
+async def main(args) -> bool:
+    if args.inline:
+        routes.verify_password_async = _verify_inline
+    models.Base.metadata.create_all(bind=models.engine)
+    email = f"load-{uuid.uuid4().hex[:8]}@example.com"
+    with SessionLocal() as db:
+        user = models.User(email=email, username=email, hashed_password=get_password_hash(PASSWORD))
+        db.add(user)
+        db.commit()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load", timeout=None) as client:
+            await client.post("/login", json={"email": email, "password": PASSWORD})  # warm up
+            codes, logins, health, elapsed = await run(client, email, args.logins)
+    finally:
+        with SessionLocal() as db:
+            db.query(models.User).filter(models.User.email == email).delete()
+            db.commit()
+
+    ok = codes.count(200)
+    print(f"{args.logins} concurrent logins ({'inline bcrypt' if args.inline else 'hash pool'}): "
+          f"{ok} ok, {codes.count(503)} shed, {args.logins - ok - codes.count(503)} errors in {elapsed:.2f}s")
+    print(f"  login   {_percentiles(logins)}")
+    print(f"  /health {_percentiles(health)}  ({len(health)} probes)")
+    return ok + codes.count(503) == args.logins
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent login load test for the auth service")
+    parser.add_argument("--logins", type=int, default=50, help="concurrent login requests")
+    parser.add_argument("--inline", action="store_true", help="verify passwords on the event loop (the old behaviour)")
+    sys.exit(0 if asyncio.run(main(parser.parse_args())) else 1)
@@ -4,7 +4,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 import os
 
-from shared.database import get_db, init_db
+from shared.database import close_async_db, get_db, init_db
+from shared.auth_middleware import password_hash_pool
+from shared.token_cache import token_cache
+from shared.sql_metrics import instrument_app
 from . import models, schemas, routes
 
 app = FastAPI(
@@ -21,6 +24,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+instrument_app(app)
 
 # Initialize database
 @app.on_event("startup")
@@ -28,9 +32,18 @@ async def startup_event():
     init_db()
     models.Base.metadata.create_all(bind=models.engine)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_async_db()
+
 # Include routes
 app.include_router(routes.router, tags=["auth"])
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "auth_service"}
+    return {
+        "status": "healthy",
+        "service": "auth_service",
+        "password_hashing": password_hash_pool.stats(),
+        "token_cache": token_cache.stats()
+    }
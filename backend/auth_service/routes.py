@@ -1,41 +1,46 @@
 """API routes for auth service"""
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
-from shared.database import get_db
+from shared.database import get_async_db, get_db
 from shared.auth_middleware import (
-    verify_password, 
-    get_password_hash, 
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     get_current_user,
+    security,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from shared.token_cache import revoke
 from . import models, schemas
 
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if email exists
-    existing_user = db.query(models.User).filter(models.User.email == user_data.email).first()
-    if existing_user:
+    if await db.scalar(select(models.User.id).where(models.User.email == user_data.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Check if username exists
-    existing_username = db.query(models.User).filter(models.User.username == user_data.username).first()
-    if existing_username:
+    if await db.scalar(select(models.User.id).where(models.User.username == user_data.username)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
+    # End the read transaction so no pooled connection is held while bcrypt runs
+    await db.commit()
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = models.User(
         email=user_data.email,
         username=user_data.username,
@@ -46,17 +51,20 @@ async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db))
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return new_user
 
 @router.post("/login", response_model=schemas.Token)
-async def login(credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user and return access token"""
-    user = db.query(models.User).filter(models.User.email == credentials.email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == credentials.email))
+    # End the read transaction before waiting on bcrypt, so a login burst doesn't pin the pool;
+    # the session doesn't expire on commit, so the loaded user stays readable
+    await db.commit()
     
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user or not await verify_password_async(credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -157,23 +165,35 @@ async def delete_user_address(
 async def change_password(
     password_data: schemas.PasswordChange,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Change user password"""
-    user = db.query(models.User).filter(models.User.id == int(current_user["sub"])).first()
+    user_id = int(current_user["sub"])
+    hashed_password = await db.scalar(select(models.User.hashed_password).where(models.User.id == user_id))
+    await db.commit()  # don't hold a pooled connection across the two bcrypt calls
+    if hashed_password is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
     
-    if not verify_password(password_data.old_password, user.hashed_password):
+    if not await verify_password_async(password_data.old_password, hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect old password"
         )
     
-    user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
+    new_hash = await get_password_hash_async(password_data.new_password)
+    await db.execute(update(models.User).where(models.User.id == user_id).values(hashed_password=new_hash))
+    await db.commit()
     
     return {"message": "Password changed successfully"}
 
 @router.post("/logout")
-async def logout(current_user: dict = Depends(get_current_user)):
-    """Logout user (client should delete token)"""
+async def logout(
+    current_user: dict = Depends(get_current_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Logout user and revoke the token across services (client should still delete it)"""
+    await revoke(credentials.credentials, current_user.get("exp"))
     return {"message": "Logged out successfully"}
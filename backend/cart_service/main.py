@@ -2,12 +2,15 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
+from redis.exceptions import ResponseError
+import httpx
 import json
 import os
 
-from shared.redis_client import get_redis
+from shared.redis_client import AsyncRedisClient, get_async_redis
 from shared.auth_middleware import get_current_user
+from shared.http_client import CircuitOpenError, close_service_clients, get_service_client
 
 app = FastAPI(
     title="Cart Service", 
@@ -21,77 +24,205 @@ app.add_middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_credentials
 class CartItem(BaseModel):
     product_id: int
     quantity: int
-    price: float
+    price: Optional[float] = None  # Ignored: carts are priced server-side
+
+class CartLine(BaseModel):
+    product_id: int
+    quantity: int
+    price: Optional[float] = None
+    name: Optional[str] = None
+    image_url: Optional[str] = None
+    stock_quantity: Optional[int] = None
+    availability: str  # in_stock, insufficient_stock, unavailable, unknown
 
 class CartResponse(BaseModel):
-    items: List[CartItem]
+    items: List[CartLine]
     total: float
 
+CART_TTL = 86400 * 7  # 7 days expiry
+CART_SNAPSHOT_TTL = int(os.getenv("CART_SNAPSHOT_TTL", "60"))
+SNAPSHOT_BATCH_SIZE = 100  # product_service /batch limit
+
+# Carts are hashes with a "<product_id>:qty" field per line; prices come from product snapshots
+def _cart_key(user_id: str) -> str:
+    return f"cart:{user_id}"
+
+def _snapshot_key(product_id: int) -> str:
+    return f"cart:snapshot:{product_id}"
+
+# Returns -1 if the cart does not exist, 0 if the item is not in it, 1 once updated
+_UPDATE_ITEM = """
+if redis.call('exists', KEYS[1]) == 0 then return -1 end
+if redis.call('hexists', KEYS[1], ARGV[1]) == 0 then return 0 end
+redis.call('hset', KEYS[1], ARGV[1], ARGV[2])
+redis.call('expire', KEYS[1], ARGV[3])
+return 1
+"""
+
+# Converts a legacy JSON-string cart into the hash layout in place, keeping its TTL
+_MIGRATE_LEGACY = """
+if redis.call('type', KEYS[1]).ok ~= 'string' then return 0 end
+local items = cjson.decode(redis.call('get', KEYS[1]))
+local ttl = redis.call('pttl', KEYS[1])
+redis.call('del', KEYS[1])
+for _, item in ipairs(items) do
+    redis.call('hincrby', KEYS[1], item['product_id'] .. ':qty', item['quantity'])
+end
+if ttl > 0 then redis.call('pexpire', KEYS[1], ttl) end
+return 1
+"""
+
+async def _with_legacy_migration(redis, key: str, operation):
+    """Run `operation`, upgrading an old JSON cart first if Redis reports WRONGTYPE"""
+    try:
+        return await operation()
+    except ResponseError as e:
+        if "WRONGTYPE" not in str(e):
+            raise
+        await redis.eval(_MIGRATE_LEGACY, 1, key)
+        return await operation()
+
+def _parse_cart(fields: dict) -> List[dict]:
+    items = []
+    for field, value in fields.items():
+        product_id, _, attr = field.partition(":")
+        if attr == "qty":  # Carts written before server-side pricing also carry ":price" fields
+            items.append({"product_id": int(product_id), "quantity": int(value)})
+    return items
+
+async def _get_snapshots(redis, product_ids: List[int]) -> Dict[int, Optional[dict]]:
+    """Price/stock snapshots in one MGET; misses are filled by one product_service batch call.
+
+    A None value means the product does not exist; ids missing from the result
+    could not be looked up (product_service unreachable).
+    """
+    if not product_ids:
+        return {}
+    payloads = await redis.mget([_snapshot_key(pid) for pid in product_ids])
+    snapshots = {pid: json.loads(payload) for pid, payload in zip(product_ids, payloads) if payload is not None}
+    missing = [pid for pid in product_ids if pid not in snapshots]
+    if not missing:
+        return snapshots
+
+    fetched = {}
+    try:
+        for start in range(0, len(missing), SNAPSHOT_BATCH_SIZE):
+            response = await get_service_client("product").post(
+                "/batch", idempotent=True, json={"ids": missing[start:start + SNAPSHOT_BATCH_SIZE]}
+            )
+            response.raise_for_status()
+            fetched.update({snapshot["id"]: snapshot for snapshot in response.json()})
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        print(f"Product snapshot lookup error: {e}")
+        return snapshots
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for pid in missing:
+            # Unknown products are cached too, so a dead cart line is not re-fetched on every view
+            pipe.setex(_snapshot_key(pid), CART_SNAPSHOT_TTL, json.dumps(fetched.get(pid)))
+        await pipe.execute()
+    snapshots.update({pid: fetched.get(pid) for pid in missing})
+    return snapshots
+
+def _price_line(item: dict, snapshots: Dict[int, Optional[dict]]) -> dict:
+    if item["product_id"] not in snapshots:
+        return {**item, "availability": "unknown"}
+    snapshot = snapshots[item["product_id"]]
+    if snapshot is None:
+        return {**item, "availability": "unavailable"}
+    line = {
+        **item,
+        "price": snapshot["price"],
+        "name": snapshot["name"],
+        "image_url": snapshot["image_url"],
+        "stock_quantity": snapshot["stock_quantity"],
+    }
+    if not snapshot["is_active"]:
+        line["availability"] = "unavailable"
+    elif snapshot["stock_quantity"] < item["quantity"]:
+        line["availability"] = "insufficient_stock"
+    else:
+        line["availability"] = "in_stock"
+    return line
+
 @app.get("/", response_model=CartResponse)
-async def get_cart(current_user: dict = Depends(get_current_user), redis = Depends(get_redis)):
-    """Get user's cart"""
-    user_id = current_user["sub"]
-    cart_data = redis.get(f"cart:{user_id}")
-    if not cart_data:
-        return {"items": [], "total": 0}
-    items = json.loads(cart_data)
-    total = sum(item["price"] * item["quantity"] for item in items)
-    return {"items": items, "total": total}
+async def get_cart(current_user: dict = Depends(get_current_user), redis = Depends(get_async_redis)):
+    """Get user's cart, priced from current product data with per-line availability"""
+    key = _cart_key(current_user["sub"])
+    items = _parse_cart(await _with_legacy_migration(redis, key, lambda: redis.hgetall(key)))
+    snapshots = await _get_snapshots(redis, [item["product_id"] for item in items])
+    lines = [_price_line(item, snapshots) for item in items]
+    total = sum(
+        line["price"] * line["quantity"] for line in lines
+        if line["price"] is not None and line["availability"] != "unavailable"
+    )
+    return {"items": lines, "total": total}
 
 @app.post("/add")
-async def add_to_cart(item: CartItem, current_user: dict = Depends(get_current_user), redis = Depends(get_redis)):
+async def add_to_cart(item: CartItem, current_user: dict = Depends(get_current_user), redis = Depends(get_async_redis)):
     """Add item to cart"""
-    user_id = current_user["sub"]
-    cart_data = redis.get(f"cart:{user_id}")
-    items = json.loads(cart_data) if cart_data else []
-    
-    # Update quantity if product exists
-    existing = next((i for i in items if i["product_id"] == item.product_id), None)
-    if existing:
-        existing["quantity"] += item.quantity
-    else:
-        items.append(item.dict())
-    
-    redis.setex(f"cart:{user_id}", 86400 * 7, json.dumps(items))  # 7 days expiry
+    key = _cart_key(current_user["sub"])
+    snapshots = await _get_snapshots(redis, [item.product_id])
+    if item.product_id in snapshots:
+        snapshot = snapshots[item.product_id]
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if not snapshot["is_active"]:
+            raise HTTPException(status_code=400, detail="Product is not available")
+
+    async def add():
+        async with redis.pipeline() as pipe:
+            pipe.hincrby(key, f"{item.product_id}:qty", item.quantity)
+            pipe.expire(key, CART_TTL)
+            return await pipe.execute()
+
+    await _with_legacy_migration(redis, key, add)
     return {"message": "Item added to cart"}
 
 @app.put("/update")
-async def update_cart_item(item: CartItem, current_user: dict = Depends(get_current_user), redis = Depends(get_redis)):
+async def update_cart_item(item: CartItem, current_user: dict = Depends(get_current_user), redis = Depends(get_async_redis)):
     """Update cart item quantity"""
-    user_id = current_user["sub"]
-    cart_data = redis.get(f"cart:{user_id}")
-    if not cart_data:
+    key = _cart_key(current_user["sub"])
+    result = await _with_legacy_migration(
+        redis, key,
+        lambda: redis.eval(_UPDATE_ITEM, 1, key, f"{item.product_id}:qty", item.quantity, CART_TTL)
+    )
+    if result == -1:
         raise HTTPException(status_code=404, detail="Cart is empty")
-    
-    items = json.loads(cart_data)
-    existing = next((i for i in items if i["product_id"] == item.product_id), None)
-    if not existing:
+    if result == 0:
         raise HTTPException(status_code=404, detail="Item not in cart")
-    
-    existing["quantity"] = item.quantity
-    redis.setex(f"cart:{user_id}", 86400 * 7, json.dumps(items))
     return {"message": "Cart updated"}
 
 @app.delete("/remove/{product_id}")
-async def remove_from_cart(product_id: int, current_user: dict = Depends(get_current_user), redis = Depends(get_redis)):
+async def remove_from_cart(product_id: int, current_user: dict = Depends(get_current_user), redis = Depends(get_async_redis)):
     """Remove item from cart"""
-    user_id = current_user["sub"]
-    cart_data = redis.get(f"cart:{user_id}")
-    if not cart_data:
+    key = _cart_key(current_user["sub"])
+
+    async def remove():
+        async with redis.pipeline() as pipe:
+            pipe.exists(key)
+            pipe.hdel(key, f"{product_id}:qty", f"{product_id}:price")
+            pipe.expire(key, CART_TTL)
+            return await pipe.execute()
+
+    exists, _, _ = await _with_legacy_migration(redis, key, remove)
+    if not exists:
         raise HTTPException(status_code=404, detail="Cart is empty")
-    
-    items = json.loads(cart_data)
-    items = [i for i in items if i["product_id"] != product_id]
-    redis.setex(f"cart:{user_id}", 86400 * 7, json.dumps(items))
     return {"message": "Item removed"}
 
 @app.delete("/clear")
-async def clear_cart(current_user: dict = Depends(get_current_user), redis = Depends(get_redis)):
+async def clear_cart(current_user: dict = Depends(get_current_user), redis = Depends(get_async_redis)):
     """Clear entire cart"""
     user_id = current_user["sub"]
-    redis.delete(f"cart:{user_id}")
+    await redis.delete(_cart_key(user_id))
     return {"message": "Cart cleared"}
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_service_clients()
+    await AsyncRedisClient.close()
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "cart_service"}
+    redis_ok = await AsyncRedisClient.ping()
+    return {"status": "healthy" if redis_ok else "degraded", "service": "cart_service", "redis": redis_ok}
@@ -1,20 +1,36 @@
-"""Coupon / Discount Code Service"""
-from fastapi import FastAPI, Depends, HTTPException, status
+"""Coupon / Discount Code Service
+
+Usage: python -m coupon_service.main <template coupon id> <count> codes.csv   # bulk single-use codes
+"""
+from fastapi import FastAPI, Depends, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Enum as SQLEnum
+from fastapi.responses import StreamingResponse
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index, Enum as SQLEnum, literal, or_, select, text, update
 from sqlalchemy.sql import func
 from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
 import enum
 import os
+import secrets
+
+import redis
 
-from shared.database import Base, engine, get_db, init_db
-from shared.auth_middleware import get_current_user, get_current_admin
+from shared.database import Base, AsyncSessionLocal, async_engine, get_async_db, init_async_db, close_async_db
+from shared.auth_middleware import get_current_user, get_current_admin, verify_internal_service
+from shared.bloom import BloomFilter
+from shared.ids import ALPHABET
+from shared.redis_client import AsyncRedisClient
+from shared.sql_metrics import instrument_app
 
 app = FastAPI(title="Coupon Service", version="1.0.0", root_path=os.getenv("ROOT_PATH", ""))
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=False, allow_methods=["*"], allow_headers=["*"])
+instrument_app(app)
 
 class DiscountType(str, enum.Enum):
     PERCENTAGE = "percentage"
@@ -33,9 +49,32 @@ class Coupon(Base):
     usage_limit = Column(Integer, nullable=True)  # None = unlimited
     usage_count = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
+    is_template = Column(Boolean, default=False)  # Settings shared by generated single-use codes
     expires_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class CouponCode(Base):
+    """Single-use code generated from a template coupon"""
+    __tablename__ = "coupon_codes"
+    code = Column(String(50), primary_key=True)
+    coupon_id = Column(Integer, ForeignKey("coupons.id", ondelete="CASCADE"), nullable=False, index=True)
+    redeemed_at = Column(DateTime(timezone=True), nullable=True)
+
+class CouponRedemption(Base):
+    """One use of a coupon claimed by an order at checkout; held until the order commits"""
+    __tablename__ = "coupon_redemptions"
+    id = Column(Integer, primary_key=True, index=True)
+    order_ref = Column(String, unique=True, index=True, nullable=False)
+    coupon_id = Column(Integer, ForeignKey("coupons.id", ondelete="CASCADE"), nullable=False)
+    code = Column(String(50), nullable=False)
+    status = Column(String, default="held", nullable=False)  # held, committed, released, expired
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_coupon_redemptions_held_expiry", "expires_at", postgresql_where=text("status = 'held'")),
+    )
+
 # Schemas
 class CouponCreate(BaseModel):
     code: str = Field(..., min_length=3, max_length=50)
@@ -45,6 +84,7 @@ class CouponCreate(BaseModel):
     min_order_amount: float = 0
     max_discount_amount: Optional[float] = None
     usage_limit: Optional[int] = None
+    is_template: bool = False
     expires_at: Optional[datetime] = None
 
 class CouponResponse(BaseModel):
@@ -58,6 +98,7 @@ class CouponResponse(BaseModel):
     usage_limit: Optional[int]
     usage_count: int
     is_active: bool
+    is_template: bool = False
     expires_at: Optional[datetime]
     class Config:
         from_attributes = True
@@ -72,28 +113,331 @@ class ApplyCouponResponse(BaseModel):
     discount_amount: float = 0
     coupon: Optional[CouponResponse] = None
 
+class RedemptionCreate(BaseModel):
+    order_ref: str = Field(..., min_length=1, max_length=100)
+    code: str
+
+class RedemptionResponse(BaseModel):
+    order_ref: str
+    code: str
+    status: str
+    expires_at: datetime
+    class Config:
+        from_attributes = True
+
+# Single-use campaign codes: "<TEMPLATE CODE>-<random>"
+COUPON_CODE_LENGTH = int(os.getenv("COUPON_CODE_LENGTH", "10"))  # 50 random bits per code
+COUPON_BULK_CHUNK_SIZE = int(os.getenv("COUPON_BULK_CHUNK_SIZE", "10000"))
+COUPON_BULK_MAX = int(os.getenv("COUPON_BULK_MAX", "1000000"))
+# Maps every random byte onto the 32-symbol alphabet; 256 is a multiple of 32, so there is no bias
+_CODE_TABLE = bytes(ord(ALPHABET[b % 32]) for b in range(256))
+_CODE_CHARS = frozenset(ALPHABET)
+
+# In-memory coupon index
+COUPON_INDEX_CHECK_INTERVAL = float(os.getenv("COUPON_INDEX_CHECK_INTERVAL", "30"))
+COUPON_BLOOM_FP_RATE = float(os.getenv("COUPON_BLOOM_FP_RATE", "0.001"))
+COUPON_VERSION_KEY = "coupons:version"
+COUPON_CHANNEL = "coupons:changed"
+
+# Checkout claims not confirmed by a committed order within the TTL give their use back
+COUPON_CLAIM_TTL_SECONDS = int(os.getenv("COUPON_CLAIM_TTL_SECONDS", "900"))
+COUPON_CLAIM_SWEEP_INTERVAL = float(os.getenv("COUPON_CLAIM_SWEEP_INTERVAL", "30"))
+COUPON_CLAIM_SWEEP_BATCH = int(os.getenv("COUPON_CLAIM_SWEEP_BATCH", "100"))
+
+# Failed lookups per user before /apply starts answering 429
+COUPON_FAILURE_LIMIT = int(os.getenv("COUPON_FAILURE_LIMIT", "10"))
+COUPON_FAILURE_WINDOW = int(os.getenv("COUPON_FAILURE_WINDOW", "900"))
+
+async def _current_version() -> Optional[str]:
+    try:
+        return await AsyncRedisClient.get_client().get(COUPON_VERSION_KEY)
+    except redis.RedisError as e:
+        print(f"Coupon version check error: {e}")
+        return None
+
+class CouponIndex:
+    """Active coupons keyed by upper-cased code, reloaded whenever the shared version stamp moves.
+
+    Admin writes bump the stamp and announce it on a pub/sub channel; every process
+    also compares stamps every COUPON_INDEX_CHECK_INTERVAL seconds in case it missed one.
+    A Bloom filter over every existing code lets guessed codes be rejected without the DB.
+    Generated single-use codes are not loaded; only their active templates are.
+    """
+
+    def __init__(self):
+        self.coupons: Dict[str, CouponResponse] = {}
+        self.templates: Dict[str, CouponResponse] = {}
+        self.known_codes = BloomFilter(1, COUPON_BLOOM_FP_RATE)
+        self.version: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, code: str) -> Optional[CouponResponse]:
+        return self.coupons.get(code.upper())
+
+    def might_exist(self, code: str) -> bool:
+        return code.upper() in self.known_codes
+
+    def template_for(self, code: str) -> Optional[CouponResponse]:
+        """Active template a generated code would belong to, judged by its shape alone"""
+        prefix, _, suffix = code.upper().rpartition("-")
+        if len(suffix) != COUPON_CODE_LENGTH or not _CODE_CHARS.issuperset(suffix):
+            return None
+        return self.templates.get(prefix)
+
+    async def reload(self):
+        # Read the stamp first: a write landing mid-load leaves us behind, never ahead
+        version = await _current_version()
+        async with AsyncSessionLocal() as db:
+            coupons = (await db.execute(select(Coupon))).scalars().all()
+        active = [CouponResponse.model_validate(c) for c in coupons if c.is_active]
+        self.coupons = {c.code: c for c in active if not c.is_template}
+        self.templates = {c.code: c for c in active if c.is_template}
+        self.known_codes = BloomFilter.from_items((c.code for c in coupons), len(coupons), COUPON_BLOOM_FP_RATE)
+        self.version = version
+
+    def start(self):
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            pubsub = AsyncRedisClient.get_client().pubsub()
+            try:
+                await pubsub.subscribe(COUPON_CHANNEL)
+                while True:
+                    await pubsub.get_message(ignore_subscribe_messages=True, timeout=COUPON_INDEX_CHECK_INTERVAL)
+                    if await _current_version() != self.version:
+                        await self.reload()
+            except Exception as e:
+                print(f"Coupon index watcher error: {e}")
+                await asyncio.sleep(COUPON_INDEX_CHECK_INTERVAL)
+                try:
+                    await self.reload()  # Redis is unreachable: fall back to a periodic reload
+                except Exception as e:
+                    print(f"Coupon index reload error: {e}")
+            finally:
+                await pubsub.aclose()
+
+coupon_index = CouponIndex()
+
+async def _publish_change():
+    """Bump the version stamp so every process reloads; this one reloads right away"""
+    try:
+        client = AsyncRedisClient.get_client()
+        version = await client.incr(COUPON_VERSION_KEY)
+        await client.publish(COUPON_CHANNEL, version)
+    except redis.RedisError as e:
+        print(f"Coupon change broadcast error: {e}")
+    await coupon_index.reload()
+
+def _failure_key(user_id: str) -> str:
+    return f"coupons:failures:{user_id}"
+
+async def _check_failure_limit(user_id: str):
+    """Reject users who keep guessing codes; fails open if Redis is down"""
+    try:
+        client = AsyncRedisClient.get_client()
+        failures = await client.get(_failure_key(user_id))
+        if failures is not None and int(failures) >= COUPON_FAILURE_LIMIT:
+            retry_after = max(await client.ttl(_failure_key(user_id)), 1)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many invalid coupon codes, please try again later",
+                headers={"Retry-After": str(retry_after)}
+            )
+    except redis.RedisError as e:
+        print(f"Coupon rate limit error: {e}")
+
+async def _record_failure(user_id: str):
+    try:
+        client = AsyncRedisClient.get_client()
+        if await client.incr(_failure_key(user_id)) == 1:
+            await client.expire(_failure_key(user_id), COUPON_FAILURE_WINDOW)
+    except redis.RedisError as e:
+        print(f"Coupon rate limit error: {e}")
+
+def _random_codes(prefix: str, count: int) -> List[str]:
+    raw = secrets.token_bytes(count * COUPON_CODE_LENGTH).translate(_CODE_TABLE).decode()
+    return [f"{prefix}-{raw[i:i + COUPON_CODE_LENGTH]}" for i in range(0, len(raw), COUPON_CODE_LENGTH)]
+
+def _insert_codes(coupon_id: int, codes: List[str]):
+    """One statement per chunk (a single array parameter); codes that already exist are skipped and not returned"""
+    table = CouponCode.__table__
+    rows = select(func.unnest(literal(codes, ARRAY(String))), literal(coupon_id))
+    return pg_insert(table).from_select(["code", "coupon_id"], rows).on_conflict_do_nothing().returning(table.c.code)
+
+async def generate_codes(coupon_id: int, prefix: str, count: int) -> AsyncIterator[str]:
+    """Insert `count` new codes for a template in chunks, yielding each committed chunk as CSV"""
+    yield "code\r\n"
+    # Opens its own session: request-scoped dependencies are closed before a streamed body is sent
+    async with AsyncSessionLocal() as db:
+        remaining = count
+        while remaining:
+            wanted = min(remaining, COUPON_BULK_CHUNK_SIZE)
+            inserted: List[str] = []
+            # Collisions are simply missing from RETURNING; draw replacements until the chunk is full
+            while len(inserted) < wanted:
+                result = await db.execute(_insert_codes(coupon_id, _random_codes(prefix, wanted - len(inserted))))
+                inserted += result.scalars().all()
+            await db.commit()
+            remaining -= wanted
+            yield "\r\n".join(inserted) + "\r\n"
+
+async def stream_codes(coupon_id: int) -> AsyncIterator[str]:
+    yield "code,redeemed_at\r\n"
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(CouponCode.code, CouponCode.redeemed_at)
+            .where(CouponCode.coupon_id == coupon_id)
+            .execution_options(yield_per=COUPON_BULK_CHUNK_SIZE)
+        )
+        async for rows in result.partitions():
+            yield "".join(f"{code},{redeemed_at.isoformat() if redeemed_at else ''}\r\n" for code, redeemed_at in rows)
+
+async def _take_use(db: AsyncSession, code: str):
+    """Count one use of `code` against its limit in a single guarded UPDATE; None if there is none left"""
+    has_uses_left = or_(Coupon.usage_limit.is_(None), Coupon.usage_count < Coupon.usage_limit)
+    increment = update(Coupon).values(usage_count=Coupon.usage_count + 1).returning(
+        Coupon.id, Coupon.code, Coupon.usage_count, Coupon.usage_limit
+    )
+    row = (await db.execute(increment.where(Coupon.code == code, Coupon.is_template == False, has_uses_left))).first()
+    if row is None:
+        # Generated single-use code: burn it, then count it against its template's limit
+        redeemed = (await db.execute(
+            update(CouponCode)
+            .where(CouponCode.code == code, CouponCode.redeemed_at.is_(None))
+            .values(redeemed_at=func.now())
+            .returning(CouponCode.coupon_id)
+        )).first()
+        if redeemed:
+            row = (await db.execute(increment.where(Coupon.id == redeemed.coupon_id, has_uses_left))).first()
+    return row
+
+async def _return_use(db: AsyncSession, redemption: CouponRedemption):
+    """Give a claimed use back: uncount it and make a generated code redeemable again"""
+    await db.execute(update(CouponCode).where(CouponCode.code == redemption.code).values(redeemed_at=None))
+    return (await db.execute(
+        update(Coupon)
+        .where(Coupon.id == redemption.coupon_id)
+        .values(usage_count=func.greatest(Coupon.usage_count - 1, 0))
+        .returning(Coupon.id, Coupon.code, Coupon.usage_count, Coupon.usage_limit)
+    )).first()
+
+async def _track_usage(row, returned: bool = False):
+    """Mirror a usage change into this process's index; tell every process when a coupon runs out or comes back"""
+    if row is None:
+        return
+    indexed = coupon_index.get(row.code) or coupon_index.templates.get(row.code)
+    if indexed:
+        indexed.usage_count = row.usage_count
+    if row.usage_limit is not None and row.usage_count + (1 if returned else 0) >= row.usage_limit:
+        await _publish_change()
+
+async def _get_redemption(db: AsyncSession, order_ref: str, lock: bool = False) -> Optional[CouponRedemption]:
+    query = select(CouponRedemption).where(CouponRedemption.order_ref == order_ref)
+    if lock:
+        query = query.with_for_update()
+    return await db.scalar(query)
+
+async def release_expired_claims() -> int:
+    """Give back the uses of one batch of claims whose order never committed; returns how many"""
+    async with AsyncSessionLocal() as db:
+        expired = (await db.execute(
+            select(CouponRedemption)
+            .where(CouponRedemption.status == "held", CouponRedemption.expires_at <= func.now())
+            .order_by(CouponRedemption.expires_at)
+            .limit(COUPON_CLAIM_SWEEP_BATCH)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        rows = []
+        for redemption in expired:
+            rows.append(await _return_use(db, redemption))
+            redemption.status = "expired"
+        await db.commit()
+    for row in rows:
+        await _track_usage(row, returned=True)
+    return len(expired)
+
+async def run_claim_sweeper():
+    """Background loop releasing expired checkout claims (orders that failed or were abandoned)"""
+    while True:
+        try:
+            released = await release_expired_claims()
+        except Exception as e:
+            print(f"Coupon claim sweeper error: {e}")
+            released = 0
+        if released < COUPON_CLAIM_SWEEP_BATCH:
+            await asyncio.sleep(COUPON_CLAIM_SWEEP_INTERVAL)
+
+async def _get_template(db: AsyncSession, coupon_id: int) -> Coupon:
+    coupon = await db.get(Coupon, coupon_id)
+    if not coupon:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not coupon.is_template:
+        raise HTTPException(status_code=400, detail="Coupon is not a template")
+    if len(coupon.code) + 1 + COUPON_CODE_LENGTH > CouponCode.code.type.length:
+        raise HTTPException(status_code=400, detail="Template code is too long for generated codes")
+    return coupon
+
 @app.on_event("startup")
 async def startup_event():
-    init_db()
-    Base.metadata.create_all(bind=engine)
+    await init_async_db()
+    async with async_engine.begin() as conn:
+        # coupons tables created before templates existed
+        await conn.execute(text("ALTER TABLE coupons ADD COLUMN IF NOT EXISTS is_template BOOLEAN DEFAULT false"))
+    await coupon_index.reload()
+    coupon_index.start()
+    app.state.claim_sweeper = asyncio.create_task(run_claim_sweeper())
 
-@app.post("/apply", response_model=ApplyCouponResponse)
-async def apply_coupon(
-    request: ApplyCouponRequest,
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Validate and calculate coupon discount"""
-    coupon = db.query(Coupon).filter(
-        Coupon.code == request.code.upper(),
-        Coupon.is_active == True
-    ).first()
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.claim_sweeper.cancel()
+    await coupon_index.stop()
+    await close_async_db()
+    await AsyncRedisClient.close()
 
+async def _evaluate(db: AsyncSession, request: ApplyCouponRequest, user_id: Optional[str]) -> ApplyCouponResponse:
+    """Validate and calculate coupon discount, served from the in-memory coupon index; unknown codes
+    count against `user_id`'s failure limit when one is given"""
+    coupon = coupon_index.get(request.code)
     if not coupon:
+        # Only unknown codes are rate limited; the hot path for real codes never touches Redis
+        if user_id:
+            await _check_failure_limit(user_id)
+        template = coupon_index.template_for(request.code)
+        if template:
+            code = request.code.upper()
+            row = (await db.execute(select(CouponCode.redeemed_at).where(
+                CouponCode.code == code,
+                CouponCode.coupon_id == template.id
+            ))).first()
+            if row and row.redeemed_at:
+                return ApplyCouponResponse(valid=False, message="This coupon has already been used")
+            coupon = template.model_copy(update={"code": code}) if row else None
+        elif coupon_index.might_exist(request.code):
+            # Inactive, or created moments ago and not indexed here yet
+            row = await db.scalar(select(Coupon).where(
+                Coupon.code == request.code.upper(),
+                Coupon.is_active == True,
+                Coupon.is_template == False
+            ))
+            coupon = CouponResponse.model_validate(row) if row else None
+
+    if not coupon:
+        if user_id:
+            await _record_failure(user_id)
         return ApplyCouponResponse(valid=False, message="Coupon code not found or expired")
 
     # Check expiry
-    if coupon.expires_at and coupon.expires_at < datetime.utcnow():
+    if coupon.expires_at and coupon.expires_at < datetime.now(timezone.utc):
         return ApplyCouponResponse(valid=False, message="This coupon has expired")
 
     # Check usage limit
@@ -125,39 +469,127 @@ async def apply_coupon(
         coupon=coupon
     )
 
-@app.post("/use/{code}")
-async def mark_coupon_used(
-    code: str,
+@app.post("/apply", response_model=ApplyCouponResponse)
+async def apply_coupon(
+    request: ApplyCouponRequest,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Validate and calculate coupon discount for the signed-in customer"""
+    return await _evaluate(db, request, current_user["sub"])
+
+@app.post("/validate", response_model=ApplyCouponResponse)
+async def validate_coupon(
+    request: ApplyCouponRequest,
+    _: None = Depends(verify_internal_service),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Increment coupon usage after successful order"""
-    coupon = db.query(Coupon).filter(Coupon.code == code.upper()).first()
-    if coupon:
-        coupon.usage_count += 1
-        db.commit()
-    return {"message": "OK"}
+    """Coupon check for order_service at checkout, where the customer may be a guest"""
+    return await _evaluate(db, request, None)
+
+@app.post("/redemptions", response_model=RedemptionResponse, status_code=status.HTTP_201_CREATED)
+async def claim_coupon(
+    data: RedemptionCreate,
+    _: None = Depends(verify_internal_service),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Atomically take one use of a coupon for an order at checkout (idempotent per order_ref).
+
+    The last use goes to exactly one order; everyone else gets a 409 before their order commits.
+    """
+    existing = await _get_redemption(db, data.order_ref)
+    if existing:
+        if existing.status in ("released", "expired"):
+            raise HTTPException(status_code=409, detail="Coupon claim was already released")
+        return existing
+
+    code = data.code.upper()
+    row = await _take_use(db, code)
+    if row is None:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Coupon not found or usage limit reached")
+    redemption = CouponRedemption(
+        order_ref=data.order_ref,
+        coupon_id=row.id,
+        code=code,
+        status="held",
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=COUPON_CLAIM_TTL_SECONDS)
+    )
+    db.add(redemption)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent retry for the same order won the race; its claim stands, our use is rolled back
+        await db.rollback()
+        return await _get_redemption(db, data.order_ref)
+    await _track_usage(row)
+    return redemption
+
+@app.post("/redemptions/{order_ref}/commit", response_model=RedemptionResponse)
+async def commit_coupon_claim(
+    order_ref: str,
+    _: None = Depends(verify_internal_service),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Make a claim permanent once its order has committed"""
+    redemption = await _get_redemption(db, order_ref, lock=True)
+    if not redemption:
+        raise HTTPException(status_code=404, detail="Coupon claim not found")
+    if redemption.status == "released":
+        raise HTTPException(status_code=409, detail="Coupon claim was already released")
+    row = None
+    if redemption.status == "expired":
+        # The claim lapsed before the order's confirmation arrived; take a use again if one is left
+        row = await _take_use(db, redemption.code)
+        if row is None:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Coupon not found or usage limit reached")
+    redemption.status = "committed"
+    await db.commit()
+    await _track_usage(row)
+    return redemption
+
+@app.post("/redemptions/{order_ref}/release", response_model=RedemptionResponse)
+async def release_coupon_claim(
+    order_ref: str,
+    _: None = Depends(verify_internal_service),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Give a claimed (or committed, for cancellations) use back to the coupon"""
+    redemption = await _get_redemption(db, order_ref, lock=True)
+    if not redemption:
+        raise HTTPException(status_code=404, detail="Coupon claim not found")
+    row = None
+    if redemption.status in ("held", "committed"):
+        row = await _return_use(db, redemption)
+    # An expired claim already gave its use back; either way it can never be committed now
+    redemption.status = "released"
+    await db.commit()
+    await _track_usage(row, returned=True)
+    return redemption
 
 # Admin routes
 @app.get("/admin/all", response_model=list[CouponResponse])
 async def list_all_coupons(
     current_admin: dict = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return db.query(Coupon).order_by(Coupon.created_at.desc()).all()
+    result = await db.execute(select(Coupon).order_by(Coupon.created_at.desc()))
+    return result.scalars().all()
 
 @app.post("/admin", response_model=CouponResponse, status_code=status.HTTP_201_CREATED)
 async def create_coupon(
     data: CouponCreate,
     current_admin: dict = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     data_dict = data.dict()
     data_dict['code'] = data_dict['code'].upper()
     coupon = Coupon(**data_dict)
     db.add(coupon)
-    db.commit()
-    db.refresh(coupon)
+    await db.commit()
+    await db.refresh(coupon)
+    await _publish_change()
     return coupon
 
 @app.put("/admin/{coupon_id}", response_model=CouponResponse)
@@ -165,31 +597,86 @@ async def update_coupon(
     coupon_id: int,
     data: CouponCreate,
     current_admin: dict = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    coupon = db.query(Coupon).filter(Coupon.id == coupon_id).first()
+    coupon = await db.get(Coupon, coupon_id)
     if not coupon:
         raise HTTPException(status_code=404, detail="Not found")
     for k, v in data.dict().items():
         setattr(coupon, k, v)
     coupon.code = coupon.code.upper()
-    db.commit()
-    db.refresh(coupon)
+    await db.commit()
+    await db.refresh(coupon)
+    await _publish_change()
     return coupon
 
 @app.delete("/admin/{coupon_id}")
 async def delete_coupon(
     coupon_id: int,
     current_admin: dict = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    c = db.query(Coupon).filter(Coupon.id == coupon_id).first()
+    c = await db.get(Coupon, coupon_id)
     if not c:
         raise HTTPException(status_code=404, detail="Not found")
-    db.delete(c)
-    db.commit()
+    await db.delete(c)
+    await db.commit()
+    await _publish_change()
     return {"message": "Deleted"}
 
+@app.post("/admin/{coupon_id}/codes")
+async def generate_coupon_codes(
+    coupon_id: int,
+    count: int = Query(..., ge=1, le=COUPON_BULK_MAX),
+    current_admin: dict = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Generate `count` random single-use codes for a template coupon, streamed back as CSV"""
+    coupon = await _get_template(db, coupon_id)
+    return StreamingResponse(
+        generate_codes(coupon.id, coupon.code, count),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={coupon.code.lower()}-codes.csv"}
+    )
+
+@app.get("/admin/{coupon_id}/codes")
+async def export_coupon_codes(
+    coupon_id: int,
+    current_admin: dict = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream every code generated for a template with its redemption time"""
+    coupon = await _get_template(db, coupon_id)
+    return StreamingResponse(
+        stream_codes(coupon.id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={coupon.code.lower()}-codes.csv"}
+    )
+
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "service": "coupon_service"}
+    return {
+        "status": "healthy",
+        "service": "coupon_service",
+        "coupon_index": {"active": len(coupon_index.coupons), "version": coupon_index.version}
+    }
+
+async def _main(args):
+    try:
+        async with AsyncSessionLocal() as db:
+            coupon = await _get_template(db, args.coupon_id)
+        with open(args.path, "w", newline="") as f:
+            async for chunk in generate_codes(coupon.id, coupon.code, args.count):
+                f.write(chunk)
+        print(f"Generated {args.count} codes for {coupon.code} in {args.path}")
+    except HTTPException as e:
+        raise SystemExit(e.detail)
+    finally:
+        await close_async_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate single-use codes for a template coupon")
+    parser.add_argument("coupon_id", type=int)
+    parser.add_argument("count", type=int)
+    parser.add_argument("path")
+    asyncio.run(_main(parser.parse_args()))
@@ -13,6 +13,8 @@ import os
 
 from shared.database import Base, engine, get_db, init_db
 from shared.auth_middleware import get_current_user, get_current_admin
+from shared.ids import id_sequence, next_number
+from shared.sql_metrics import instrument_app
 
 app = FastAPI(
     title="Delivery Service", 
@@ -22,6 +24,7 @@ app = FastAPI(
 
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
 app.add_middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+instrument_app(app)
 
 # Models
 class DeliveryStatus(str, enum.Enum):
@@ -33,6 +36,8 @@ class DeliveryStatus(str, enum.Enum):
     DELIVERED = "delivered"
     FAILED = "failed"
 
+TRACKING_NUMBER_SEQ = id_sequence("tracking_number_seq")
+
 class Delivery(Base):
     __tablename__ = "deliveries"
     id = Column(Integer, primary_key=True, index=True)
@@ -82,9 +87,8 @@ async def startup_event():
 @app.post("/", response_model=DeliveryResponse, status_code=status.HTTP_201_CREATED)
 async def create_delivery(delivery_data: DeliveryCreate, current_admin: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     """Create delivery record (admin only)"""
-    import random
-    tracking_number = f"TRK-{random.randint(1000000, 9999999)}"
-    
+    tracking_number = next_number(db, TRACKING_NUMBER_SEQ, "TRK")
+
     delivery = Delivery(
         order_id=delivery_data.order_id,
         tracking_number=tracking_number,
@@ -1,19 +1,24 @@
 """Order Service - Order processing and management"""
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, Enum as SQLEnum, delete, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import relationship, selectinload
 from sqlalchemy.sql import func
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Literal, Optional
+from datetime import date, datetime, timezone
 import enum
 import os
-import httpx
 
-from shared.database import Base, engine, get_db, init_db
+from shared.database import Base, AsyncSessionLocal, async_engine, ensure_indexes, get_async_db, init_async_db, close_async_db
+from shared.http_client import get_service_client, close_service_clients
+from .outbox import OutboxEvent, dispatcher, on_rejected
 from shared.auth_middleware import get_current_user, get_current_admin, get_optional_user
+from shared.ids import id_sequence, next_number_async
+from shared.pagination import apply_keyset, encode_cursor
+from shared.sql_metrics import instrument_app
 
 app = FastAPI(
     title="Order Service", 
@@ -21,7 +26,8 @@ app = FastAPI(
     root_path=os.getenv("ROOT_PATH", "")
 )
 
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=False, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=False, allow_methods=["*"], allow_headers=["*"], expose_headers=["X-Next-Cursor"])
+instrument_app(app)
 
 # Models
 class OrderStatus(str, enum.Enum):
@@ -31,6 +37,8 @@ class OrderStatus(str, enum.Enum):
     DELIVERED = "delivered"
     CANCELLED = "cancelled"
 
+ORDER_NUMBER_SEQ = id_sequence("order_number_seq")
+
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True, index=True)
@@ -47,14 +55,21 @@ class Order(Base):
     billing_address = Column(String)
     phone = Column(String)
     notes = Column(String)
+    coupon_code = Column(String(50), nullable=True)  # claimed at checkout, given back on cancellation
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    # Order history pages seek on (created_at, id), per customer and store-wide
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at", "id"),
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     product_id = Column(Integer, nullable=False)
     product_name = Column(String, nullable=False)
     quantity = Column(Integer, nullable=False)
@@ -62,6 +77,14 @@ class OrderItem(Base):
     total = Column(Float, nullable=False)
     order = relationship("Order", back_populates="items")
 
+class OrderDailyStat(Base):
+    """Per-day, per-status order counts and totals, maintained as orders are created and updated"""
+    __tablename__ = "order_daily_stats"
+    day = Column(Date, primary_key=True)
+    status = Column(SQLEnum(OrderStatus), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
 # Schemas
 class OrderItemCreate(BaseModel):
     product_id: int
@@ -84,6 +107,8 @@ class OrderCreate(BaseModel):
     guest_email: Optional[str] = None
     guest_name: Optional[str] = None
     coupon_code: Optional[str] = None
+    # Card orders keep their stock hold until payment_service commits it; cash on delivery commits with the order
+    payment_method: Literal["cod", "card"] = "cod"
 
 class OrderResponse(BaseModel):
     id: int
@@ -102,42 +127,164 @@ class OrderResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class OrderSummary(BaseModel):
+    """List-view projection: order header plus an item count, no line items"""
+    id: int
+    user_id: Optional[int]
+    guest_email: Optional[str]
+    order_number: str
+    status: str
+    subtotal: float
+    tax: float
+    shipping_cost: float
+    total: float
+    shipping_address: str
+    phone: str
+    created_at: datetime
+    item_count: int
+    class Config:
+        from_attributes = True
+
+# Stats
+def _empty_stats() -> dict:
+    return {"total": 0, **{s.value: 0 for s in OrderStatus}, "revenue": 0.0}
+
+async def _bump_order_stats(db: AsyncSession, day: date, order_status: OrderStatus, count: int, revenue: float):
+    """Upsert a delta into the (day, status) counter row"""
+    stmt = pg_insert(OrderDailyStat).values(day=day, status=order_status, order_count=count, revenue=revenue)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[OrderDailyStat.day, OrderDailyStat.status],
+        set_={
+            "order_count": OrderDailyStat.order_count + stmt.excluded.order_count,
+            "revenue": OrderDailyStat.revenue + stmt.excluded.revenue,
+        }
+    )
+    await db.execute(stmt)
+
+async def rebuild_order_stats(db: AsyncSession, only_if_empty: bool = False):
+    """Recompute every counter row from the orders table; with `only_if_empty`, skip it if another rebuild got there first"""
+    # Concurrent rebuilds and checkout bumps wait on this lock, so none can land between the delete and the insert
+    await db.execute(text("LOCK TABLE order_daily_stats IN EXCLUSIVE MODE"))
+    if only_if_empty and await db.scalar(select(OrderDailyStat.day).limit(1)) is not None:
+        await db.rollback()
+        return
+    day = func.date(func.timezone("UTC", Order.created_at))
+    await db.execute(delete(OrderDailyStat))
+    await db.execute(
+        pg_insert(OrderDailyStat).from_select(
+            ["day", "status", "order_count", "revenue"],
+            select(day, Order.status, func.count(), func.coalesce(func.sum(Order.total), 0)).group_by(day, Order.status)
+        )
+    )
+    await db.commit()
+
+# Inventory
+def reservation_ref(order_id: int) -> str:
+    return f"order-{order_id}"
+
+def order_id_from_ref(order_ref: str) -> int:
+    return int(order_ref.removeprefix("order-"))
+
+async def _reserve_stock(order_id: int, items: List[OrderItemCreate]):
+    try:
+        # Safe to retry: product_service dedupes on order_ref
+        resp = await get_service_client("product").post(
+            "/reservations",
+            idempotent=True,
+            json={
+                "order_ref": reservation_ref(order_id),
+                "items": [{"product_id": i.product_id, "quantity": i.quantity} for i in items]
+            }
+        )
+    except Exception as e:
+        print(f"Product service error: {e}")
+        raise HTTPException(status_code=503, detail="Inventory is temporarily unavailable")
+    if resp.status_code == 409:
+        raise HTTPException(status_code=409, detail=resp.json()["detail"])
+    if resp.status_code >= 400:
+        raise HTTPException(status_code=503, detail="Inventory is temporarily unavailable")
+
+# Coupons
+async def _claim_coupon(order_id: int, code: str):
+    """Take one use of the coupon for this order; the last use of a limited code goes to one order only"""
+    try:
+        # Safe to retry: coupon_service dedupes on order_ref
+        resp = await get_service_client("coupon").post(
+            "/redemptions",
+            idempotent=True,
+            json={"order_ref": reservation_ref(order_id), "code": code}
+        )
+    except Exception as e:
+        print(f"Coupon service error: {e}")
+        raise HTTPException(status_code=503, detail="Coupons are temporarily unavailable")
+    if resp.status_code == 409:
+        raise HTTPException(status_code=409, detail="This coupon has already been used or has reached its usage limit")
+    if resp.status_code >= 400:
+        raise HTTPException(status_code=503, detail="Coupons are temporarily unavailable")
+
+async def _release_coupon(order_id: int):
+    try:
+        await get_service_client("coupon").post(f"/redemptions/{reservation_ref(order_id)}/release", idempotent=True)
+    except Exception as e:
+        # An unconfirmed claim gives its use back when it expires anyway
+        print(f"Coupon service error: {e}")
+
 # Routes
 @app.on_event("startup")
 async def startup_event():
-    init_db()
-    Base.metadata.create_all(bind=engine)
+    await init_async_db()
+    async with async_engine.begin() as conn:
+        # orders tables created before coupons were claimed at checkout
+        await conn.execute(text("ALTER TABLE orders ADD COLUMN IF NOT EXISTS coupon_code VARCHAR(50)"))
+        await ensure_indexes(conn, Order.__table__, OrderItem.__table__)
+    # Backfill counters for orders placed before the stats table existed
+    async with AsyncSessionLocal() as db:
+        if await db.scalar(select(OrderDailyStat.day).limit(1)) is None:
+            await rebuild_order_stats(db, only_if_empty=True)
+    dispatcher.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await dispatcher.stop()
+    await close_async_db()
+    await close_service_clients()
 
 @app.post("/", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order_data: OrderCreate, 
     current_user: Optional[dict] = Depends(get_optional_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new order (supports guest, coupons, and notifications)"""
-    import random
-    order_number = f"ORD-{random.randint(100000, 999999)}"
+    # Draw the order's id and number up front and end the transaction: the coupon and stock calls below
+    # are keyed on the id, and no transaction (or pooled connection) should sit idle while they run
+    order_id = await db.scalar(text("SELECT nextval(pg_get_serial_sequence('orders', 'id'))"))
+    order_number = await next_number_async(db, ORDER_NUMBER_SEQ, "ORD")
+    await db.commit()
     
     subtotal = sum(item.price * item.quantity for item in order_data.items)
     
-    # 1. Apply Coupon if provided
+    # 1. Apply Coupon if provided; the customer saw the discount, so never silently charge without it
     discount_amount = 0.0
     applied_coupon = None
     if order_data.coupon_code:
         try:
-            async with httpx.AsyncClient() as client:
-                coupon_resp = await client.post(
-                    f"{os.getenv('COUPON_SERVICE_URL')}/apply",
-                    json={"code": order_data.coupon_code, "order_total": subtotal},
-                    headers={"Authorization": f"Bearer {current_user['access_token']}"} if current_user else {}
-                )
-                if coupon_resp.status_code == 200:
-                    data = coupon_resp.json()
-                    if data["valid"]:
-                        discount_amount = data["discount_amount"]
-                        applied_coupon = order_data.coupon_code
+            # Validation only, so safe to retry
+            coupon_resp = await get_service_client("coupon").post(
+                "/validate",
+                idempotent=True,
+                json={"code": order_data.coupon_code, "order_total": subtotal}
+            )
         except Exception as e:
             print(f"Coupon service error: {e}")
+            raise HTTPException(status_code=503, detail="Coupons are temporarily unavailable")
+        if coupon_resp.status_code >= 400:
+            raise HTTPException(status_code=503, detail="Coupons are temporarily unavailable")
+        data = coupon_resp.json()
+        if not data["valid"]:
+            raise HTTPException(status_code=400, detail=data["message"])
+        discount_amount = data["discount_amount"]
+        applied_coupon = order_data.coupon_code
 
     # 2. Calculate Final Totals
     tax_rate = float(os.getenv("TAX_RATE", "0.1"))
@@ -150,8 +297,20 @@ async def create_order(
     total = round(subtotal - discount_amount + tax + shipping_cost, 2)
     
     user_id = int(current_user["sub"]) if current_user else None
-    
+
+    # Claim the coupon use, then hold stock for every line; the order is only written if both succeed.
+    # Claims and holds left by an order that never commits expire on their own.
+    if applied_coupon:
+        await _claim_coupon(order_id, applied_coupon)
+    try:
+        await _reserve_stock(order_id, order_data.items)
+    except HTTPException:
+        if applied_coupon:
+            await _release_coupon(order_id)
+        raise
+
     order = Order(
+        id=order_id,
         user_id=user_id,
         guest_email=order_data.guest_email if not user_id else None,
         guest_name=order_data.guest_name if not user_id else None,
@@ -163,10 +322,10 @@ async def create_order(
         shipping_address=order_data.shipping_address,
         billing_address=order_data.billing_address or order_data.shipping_address,
         phone=order_data.phone,
-        notes=order_data.notes if not applied_coupon else f"{order_data.notes or ''} [Coupon: {applied_coupon}]"
+        notes=order_data.notes if not applied_coupon else f"{order_data.notes or ''} [Coupon: {applied_coupon}]",
+        coupon_code=applied_coupon
     )
     db.add(order)
-    db.flush()
     
     for item_data in order_data.items:
         item = OrderItem(
@@ -178,86 +337,177 @@ async def create_order(
             total=item_data.price * item_data.quantity
         )
         db.add(item)
-    
-    db.commit()
-    db.refresh(order)
 
-    # 3. Send Notification
+    # 3. Queue notification, coupon claim and (unless payment is pending) stock commits
+    #    in the same transaction as the order, so none of them can happen for an order that did not
     customer_email = order.guest_email if not user_id else current_user.get("email")
     if customer_email:
-        try:
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    f"{os.getenv('NOTIFICATION_SERVICE_URL')}/order-confirmation",
-                    params={
-                        "email": customer_email,
-                        "order_number": order.order_number,
-                        "total": order.total
-                    }
-                )
-        except Exception as e:
-            print(f"Notification service error: {e}")
-
-    # 4. Mark coupon as used if applied
+        db.add(OutboxEvent(
+            event_type="order_confirmation",
+            payload={"email": customer_email, "order_number": order.order_number, "total": order.total}
+        ))
     if applied_coupon:
-        try:
-            async with httpx.AsyncClient() as client:
-                 await client.post(f"{os.getenv('COUPON_SERVICE_URL')}/use/{applied_coupon}")
-        except: pass
+        db.add(OutboxEvent(event_type="coupon_commit", payload={"order_ref": reservation_ref(order.id)}))
+    if order_data.payment_method == "cod":
+        db.add(OutboxEvent(event_type="stock_commit", payload={"order_ref": reservation_ref(order.id)}))
+
+    # Last statement before commit: keeps the lock on today's counter row short
+    await _bump_order_stats(db, datetime.now(timezone.utc).date(), OrderStatus.PENDING, 1, total)
+
+    await db.commit()
+    await db.refresh(order, ["created_at", "items"])
+    dispatcher.notify()
 
     return order
 
-@app.get("/admin/all", response_model=List[OrderResponse])
+# Order history, newest first; summaries only, full line items come from the detail endpoints
+ORDER_HISTORY_SORT = "newest"
+
+def _summary_query():
+    item_count = (
+        select(func.count(OrderItem.id)).where(OrderItem.order_id == Order.id).correlate(Order).scalar_subquery()
+    )
+    return select(
+        Order.id, Order.user_id, Order.guest_email, Order.order_number, Order.status,
+        Order.subtotal, Order.tax, Order.shipping_cost, Order.total,
+        Order.shipping_address, Order.phone, Order.created_at,
+        item_count.label("item_count"),
+    )
+
+async def _order_page(db: AsyncSession, query, limit: int, cursor: Optional[str], response: Response) -> list:
+    """Fetch one page of order summaries and put the next page's cursor in X-Next-Cursor"""
+    try:
+        query = apply_keyset(query, ORDER_HISTORY_SORT, Order.created_at, Order.id, descending=True, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(ORDER_HISTORY_SORT, rows[-1].created_at, rows[-1].id)
+    return [dict(row._mapping) for row in rows]
+
+@app.get("/admin/all", response_model=List[OrderSummary])
 async def list_all_orders(
-    skip: int = 0, limit: int = 100,
+    response: Response,
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_admin: dict = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List all orders (admin only)"""
-    orders = db.query(Order).order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
-    return orders
+    """List all orders, newest first (admin only); follow X-Next-Cursor for older pages"""
+    return await _order_page(db, _summary_query(), limit, cursor, response)
 
-@app.get("/", response_model=List[OrderResponse])
-async def list_orders(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    """List user's orders"""
-    orders = db.query(Order).filter(Order.user_id == int(current_user["sub"])).order_by(Order.created_at.desc()).all()
-    return orders
+@app.get("/", response_model=List[OrderSummary])
+async def list_orders(
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List user's orders, newest first; follow X-Next-Cursor for older pages"""
+    query = _summary_query().where(Order.user_id == int(current_user["sub"]))
+    return await _order_page(db, query, limit, cursor, response)
 
 @app.get("/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: int, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_order(order_id: int, current_user: dict = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Get order by ID"""
-    order = db.query(Order).filter(Order.id == order_id, Order.user_id == int(current_user["sub"])).first()
+    result = await db.execute(
+        select(Order).options(selectinload(Order.items))
+        .where(Order.id == order_id, Order.user_id == int(current_user["sub"]))
+    )
+    order = result.scalars().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
 @app.put("/{order_id}/status")
-async def update_order_status(order_id: int, status: OrderStatus, current_admin: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+async def update_order_status(order_id: int, status: OrderStatus, current_admin: dict = Depends(get_current_admin), db: AsyncSession = Depends(get_async_db)):
     """Update order status (admin only)"""
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # Row lock: concurrent updates must each move the order out of the status the previous one left
+    order = await db.get(Order, order_id, with_for_update=True)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
+    if order.status == OrderStatus.CANCELLED and status != OrderStatus.CANCELLED:
+        # Its stock and coupon use went back on cancellation and may have been taken since
+        raise HTTPException(status_code=400, detail="Cancelled orders cannot be reopened")
+    if order.status != status:
+        day = order.created_at.astimezone(timezone.utc).date()
+        await _bump_order_stats(db, day, order.status, -1, -order.total)
+        await _bump_order_stats(db, day, status, 1, order.total)
+        if status == OrderStatus.CANCELLED:
+            db.add(OutboxEvent(event_type="stock_release", payload={"order_ref": reservation_ref(order.id)}))
+            if order.coupon_code:
+                db.add(OutboxEvent(event_type="coupon_release", payload={"order_ref": reservation_ref(order.id)}))
     order.status = status
-    db.commit()
+    await db.commit()
+    dispatcher.notify()
     return {"message": "Order status updated", "status": status}
 
+@on_rejected("stock_commit")
+async def cancel_unshippable_order(db: AsyncSession, event: OutboxEvent):
+    """A cash-on-delivery order whose stock hold lapsed and was sold again cannot ship; cancel it
+    instead of leaving it pending with no stock behind it"""
+    order = await db.get(Order, order_id_from_ref(event.payload["order_ref"]), with_for_update=True)
+    if not order or order.status == OrderStatus.CANCELLED:
+        return
+    print(f"Cancelling order {order.order_number}: its stock could not be committed ({event.last_error})")
+    day = order.created_at.astimezone(timezone.utc).date()
+    await _bump_order_stats(db, day, order.status, -1, -order.total)
+    await _bump_order_stats(db, day, OrderStatus.CANCELLED, 1, order.total)
+    if order.coupon_code:
+        db.add(OutboxEvent(event_type="coupon_release", payload={"order_ref": reservation_ref(order.id)}))
+    order.status = OrderStatus.CANCELLED
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "order_service"}
 
 @app.get("/admin/stats")
-async def order_stats(current_admin: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    """Get order statistics (admin only)"""
-    total = db.query(Order).count()
-    pending = db.query(Order).filter(Order.status == OrderStatus.PENDING).count()
-    processing = db.query(Order).filter(Order.status == OrderStatus.PROCESSING).count()
-    shipped = db.query(Order).filter(Order.status == OrderStatus.SHIPPED).count()
-    delivered = db.query(Order).filter(Order.status == OrderStatus.DELIVERED).count()
-    cancelled = db.query(Order).filter(Order.status == OrderStatus.CANCELLED).count()
-    from sqlalchemy import func as sqlfunc
-    revenue = db.query(sqlfunc.sum(Order.total)).filter(Order.status == OrderStatus.DELIVERED).scalar() or 0
-    return {
-        "total": total, "pending": pending, "processing": processing,
-        "shipped": shipped, "delivered": delivered, "cancelled": cancelled,
-        "revenue": round(revenue, 2)
-    }
+async def order_stats(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    daily: bool = False,
+    current_admin: dict = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get order statistics (admin only), optionally windowed and bucketed per day"""
+    query = select(OrderDailyStat)
+    if since:
+        query = query.where(OrderDailyStat.day >= since)
+    if until:
+        query = query.where(OrderDailyStat.day <= until)
+    result = await db.execute(query.order_by(OrderDailyStat.day))
+
+    stats = _empty_stats()
+    days = {}
+    for row in result.scalars().all():
+        buckets = [stats]
+        if daily:
+            buckets.append(days.setdefault(row.day, {"date": row.day.isoformat(), **_empty_stats()}))
+        for bucket in buckets:
+            bucket[row.status.value] += row.order_count
+            bucket["total"] += row.order_count
+            if row.status == OrderStatus.DELIVERED:
+                bucket["revenue"] += row.revenue
+
+    for bucket in [stats, *days.values()]:
+        bucket["revenue"] = round(bucket["revenue"], 2)
+    if daily:
+        stats["daily"] = list(days.values())
+    return stats
+
+@app.post("/admin/stats/rebuild")
+async def rebuild_stats(current_admin: dict = Depends(get_current_admin), db: AsyncSession = Depends(get_async_db)):
+    """Recompute the stats table from orders in a single GROUP BY pass (admin only)"""
+    await rebuild_order_stats(db)
+    return {"message": "Order stats rebuilt"}
+
+@app.get("/admin/{order_id}", response_model=OrderResponse)
+async def get_order_admin(order_id: int, current_admin: dict = Depends(get_current_admin), db: AsyncSession = Depends(get_async_db)):
+    """Get any order with its line items (admin only)"""
+    result = await db.execute(select(Order).options(selectinload(Order.items)).where(Order.id == order_id))
+    order = result.scalars().first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
@@ -0,0 +1,131 @@
+"""Transactional outbox for order side effects (notifications, coupon and stock commit and release)"""
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, select, text
+from sqlalchemy.sql import func
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+import asyncio
+import os
+
+from shared.database import Base, AsyncSessionLocal
+from shared.http_client import get_service_client
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_MAX_BACKOFF = int(os.getenv("OUTBOX_MAX_BACKOFF", "600"))
+
+class OutboxEvent(Base):
+    __tablename__ = "order_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, default="pending", nullable=False)  # pending, sent, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_error = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_order_outbox_pending", "next_attempt_at", postgresql_where=text("status = 'pending'")),
+    )
+
+class PermanentDeliveryError(Exception):
+    """Downstream rejected the event; retrying will not help"""
+
+_rejection_handlers: Dict[str, Callable] = {}
+
+def on_rejected(event_type: str):
+    """Register a handler run, in the drain transaction, when downstream permanently rejects an event"""
+    def register(handler):
+        _rejection_handlers[event_type] = handler
+        return handler
+    return register
+
+async def _deliver(event: OutboxEvent):
+    if event.event_type == "order_confirmation":
+        response = await get_service_client("notification").post("/order-confirmation", params=event.payload)
+    elif event.event_type == "coupon_commit":
+        response = await get_service_client("coupon").post(f"/redemptions/{event.payload['order_ref']}/commit")
+    elif event.event_type == "coupon_release":
+        response = await get_service_client("coupon").post(f"/redemptions/{event.payload['order_ref']}/release")
+    elif event.event_type == "stock_commit":
+        response = await get_service_client("product").post(f"/reservations/{event.payload['order_ref']}/commit")
+    elif event.event_type == "stock_release":
+        response = await get_service_client("product").post(f"/reservations/{event.payload['order_ref']}/release")
+    else:
+        raise PermanentDeliveryError(f"Unknown event type {event.event_type}")
+    if response.status_code >= 500:
+        raise RuntimeError(f"HTTP {response.status_code}")
+    if response.status_code >= 400:
+        raise PermanentDeliveryError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+async def drain_once() -> int:
+    """Deliver one batch of due events; returns how many were claimed"""
+    async with AsyncSessionLocal() as db:
+        # SKIP LOCKED lets several workers drain the outbox without double delivery
+        result = await db.execute(
+            select(OutboxEvent)
+            .where(OutboxEvent.status == "pending", OutboxEvent.next_attempt_at <= func.now())
+            .order_by(OutboxEvent.id)
+            .limit(OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        events = result.scalars().all()
+        if not events:
+            return 0
+
+        outcomes = await asyncio.gather(*(_deliver(e) for e in events), return_exceptions=True)
+        now = datetime.now(timezone.utc)
+        for event, error in zip(events, outcomes):
+            if error is None:
+                event.status = "sent"
+                continue
+            event.attempts += 1
+            event.last_error = str(error)[:500]
+            if isinstance(error, PermanentDeliveryError) or event.attempts >= OUTBOX_MAX_ATTEMPTS:
+                event.status = "failed"
+                if isinstance(error, PermanentDeliveryError) and event.event_type in _rejection_handlers:
+                    await _rejection_handlers[event.event_type](db, event)
+            else:
+                event.next_attempt_at = now + timedelta(seconds=min(2 ** event.attempts, OUTBOX_MAX_BACKOFF))
+        await db.commit()
+        return len(events)
+
+class OutboxDispatcher:
+    """Background task draining the outbox; woken early whenever an order commits"""
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                drained = await drain_once()
+            except Exception as e:
+                print(f"Outbox dispatcher error: {e}")
+                drained = 0
+            if drained == OUTBOX_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+dispatcher = OutboxDispatcher()
@@ -1,5 +1,6 @@
 """Payment Service - Payment processing with Stripe"""
 from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
@@ -11,6 +12,8 @@ import os
 
 from shared.database import Base, engine, get_db, init_db
 from shared.auth_middleware import get_current_user
+from shared.http_client import get_service_client, close_service_clients
+from shared.sql_metrics import instrument_app
 
 app = FastAPI(
     title="Payment Service", 
@@ -20,6 +23,7 @@ app = FastAPI(
 
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
 app.add_middleware(CORSMiddleware, allow_origins=CORS_ORIGINS, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+instrument_app(app)
 
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_your_stripe_key")
 
@@ -51,11 +55,36 @@ async def startup_event():
     init_db()
     Base.metadata.create_all(bind=engine)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_service_clients()
+
+async def _commit_reservation(order_id: int) -> bool:
+    """Make a paid order's stock hold permanent; False if its stock could not be secured"""
+    response = await get_service_client("product").post(f"/reservations/order-{order_id}/commit", idempotent=True)
+    if response.status_code in (404, 409):
+        # The hold expired and the stock was sold again (or the order never got one)
+        print(f"Stock for paid order {order_id} is unavailable: {response.text[:200]}")
+        return False
+    # Anything else fails the webhook, so Stripe delivers it again
+    response.raise_for_status()
+    return True
+
+async def _release_reservation(order_id: int):
+    """Return a failed payment's stock hold to inventory"""
+    try:
+        await get_service_client("product").post(f"/reservations/order-{order_id}/release", idempotent=True)
+    except Exception as e:
+        # An uncommitted hold is released by its TTL anyway
+        print(f"Product service error: {e}")
+
 @app.post("/intent", response_model=PaymentIntentResponse)
 async def create_payment_intent(payment_data: PaymentIntentCreate, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
     """Create Stripe payment intent"""
     try:
-        intent = stripe.PaymentIntent.create(
+        # The Stripe SDK is blocking; keep its network round trips off the event loop
+        intent = await run_in_threadpool(
+            stripe.PaymentIntent.create,
             amount=int(payment_data.amount * 100),  # Convert to cents
             currency=payment_data.currency,
             metadata={"order_id": payment_data.order_id, "user_id": current_user["sub"]}
@@ -90,9 +119,22 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         if event["type"] == "payment_intent.succeeded":
             payment_intent = event["data"]["object"]
             payment = db.query(Payment).filter(Payment.stripe_payment_intent_id == payment_intent["id"]).first()
-            if payment:
+            if payment and payment.status != "refunded":
                 payment.status = "succeeded"
                 db.commit()
+                if not await _commit_reservation(payment.order_id):
+                    # Never keep money for an order we cannot ship
+                    await run_in_threadpool(stripe.Refund.create, payment_intent=payment.stripe_payment_intent_id)
+                    payment.status = "refunded"
+                    db.commit()
+
+        elif event["type"] == "payment_intent.payment_failed":
+            payment_intent = event["data"]["object"]
+            payment = db.query(Payment).filter(Payment.stripe_payment_intent_id == payment_intent["id"]).first()
+            if payment:
+                payment.status = "failed"
+                db.commit()
+                await _release_reservation(payment.order_id)
         
         return {"status": "success"}
     except Exception as e:
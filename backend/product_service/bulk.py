@@ -0,0 +1,268 @@
+"""Bulk catalog import/export (CSV or NDJSON), streamed end to end.
+
+Usage: python -m product_service.bulk import products.csv
+       python -m product_service.bulk export products.ndjson
+"""
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, insert, literal_column, select
+from typing import AsyncIterator, List, Optional
+import argparse
+import asyncio
+import codecs
+import csv
+import io
+import json
+import os
+
+from shared.database import AsyncSessionLocal, close_async_db, get_async_db
+from shared.auth_middleware import get_current_admin
+from . import cache, models, schemas
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+
+PRODUCT_FIELDS = list(schemas.ProductBase.model_fields)
+# Fields an existing product can take from an import row; the slug is the upsert key
+UPDATE_FIELDS = [name for name in PRODUCT_FIELDS if name != "slug"]
+IMAGE_SEPARATOR = "|"
+
+router = APIRouter()
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into newline-terminated lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+def _images_from_urls(urls: str) -> List[dict]:
+    return [
+        {"image_url": url, "is_primary": position == 0, "sort_order": position}
+        for position, url in enumerate(u.strip() for u in urls.split(IMAGE_SEPARATOR)) if url
+    ]
+
+async def _iter_rows(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[tuple]:
+    """Yield (row number, dict or parse error) for each data row"""
+    row = 0
+    if fmt == "ndjson":
+        async for line in lines:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                data = json.loads(line)
+                yield row, data if isinstance(data, dict) else ValueError("Expected a JSON object")
+            except ValueError as e:
+                yield row, ValueError(f"Invalid JSON: {e}")
+        return
+
+    header: Optional[List[str]] = None
+    record: List[str] = []
+    quotes = 0
+    async for line in lines:
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue  # Newline inside a quoted field; the record continues on the next line
+        fields = next(csv.reader(record), [])
+        record, quotes = [], 0
+        if not fields:
+            continue
+        if header is None:
+            header = [name.strip() for name in fields]
+            continue
+        row += 1
+        if len(fields) != len(header):
+            yield row, ValueError(f"Expected {len(header)} columns, got {len(fields)}")
+            continue
+        # Empty cells fall back to the schema defaults
+        data = {name: value for name, value in zip(header, fields) if value != ""}
+        urls = data.pop("image_urls", None)
+        if urls:
+            data["images"] = _images_from_urls(urls)
+        yield row, data
+
+def _record_error(report: schemas.ImportReport, row: int, messages: List[str]):
+    report.failed += 1
+    if len(report.errors) < BULK_MAX_ERRORS:
+        report.errors.append(schemas.ImportRowError(row=row, errors=messages))
+
+def _validation_messages(error: Exception) -> List[str]:
+    if isinstance(error, ValidationError):
+        return [f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()]
+    return [str(error)]
+
+def _updated_fields(product: schemas.ProductCreate) -> tuple:
+    """Fields the row actually carried (CSV columns with a value, JSON keys); only these overwrite an existing product"""
+    return tuple(name for name in UPDATE_FIELDS if name in product.model_fields_set)
+
+async def _upsert(db: AsyncSession, batch: list) -> tuple:
+    """Insert-or-update one chunk by slug and replace images where given; returns (created, updated ids).
+
+    New products get schema defaults for missing fields; existing ones keep them, so a
+    price-only file does not reset stock, category or SKU. One statement per distinct field set.
+    """
+    table = models.Product.__table__
+    groups = {}
+    for _, product in batch:
+        groups.setdefault(_updated_fields(product), []).append(product)
+    result = []
+    for fields, products in groups.items():
+        stmt = pg_insert(table).values([product.dict(exclude={"images"}) for product in products])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.slug],
+            set_={**{name: stmt.excluded[name] for name in fields}, "updated_at": func.now()}
+        ).returning(table.c.id, table.c.slug, literal_column("xmax = 0").label("inserted"))
+        result += (await db.execute(stmt)).all()
+
+    ids = {slug: product_id for product_id, slug, _ in result}
+    with_images = [(ids[product.slug], product.images) for _, product in batch if product.images]
+    if with_images:
+        images = models.ProductImage.__table__
+        await db.execute(delete(images).where(images.c.product_id.in_([pid for pid, _ in with_images])))
+        await db.execute(
+            insert(images),
+            [{"product_id": pid, **image.dict()} for pid, product_images in with_images for image in product_images]
+        )
+    created = sum(1 for _, _, inserted in result if inserted)
+    return created, [product_id for product_id, _, inserted in result if not inserted]
+
+async def _write_chunk(db: AsyncSession, batch: list, report: schemas.ImportReport):
+    # Postgres cannot upsert the same row twice in one statement; the last row for a slug wins
+    batch = list({product.slug: (row, product) for row, product in batch}.values())
+    updated_ids: List[int] = []
+    try:
+        async with db.begin_nested():
+            created, updated_ids = await _upsert(db, batch)
+        report.created += created
+    except DBAPIError:
+        # Duplicate sku/barcode, unknown category, oversized value...: isolate the bad rows
+        for row, product in batch:
+            try:
+                async with db.begin_nested():
+                    created, updated = await _upsert(db, [(row, product)])
+                report.created += created
+                updated_ids += updated
+            except DBAPIError as e:
+                _record_error(report, row, [str(e.orig).strip().splitlines()[-1][:300]])
+    await db.commit()
+    report.updated += len(updated_ids)
+    if updated_ids:
+        await cache.invalidate(*(cache.product_key(product_id) for product_id in updated_ids))
+
+async def run_import(db: AsyncSession, chunks: AsyncIterator[bytes], fmt: str) -> schemas.ImportReport:
+    """Validate every row with ProductCreate and upsert the valid ones in chunks of BULK_CHUNK_SIZE"""
+    report = schemas.ImportReport()
+    batch = []
+    async for row, data in _iter_rows(_iter_lines(chunks), fmt):
+        report.processed += 1
+        try:
+            if isinstance(data, Exception):
+                raise data
+            batch.append((row, schemas.ProductCreate(**data)))
+        except ValueError as e:
+            _record_error(report, row, _validation_messages(e))
+            continue
+        if len(batch) >= BULK_CHUNK_SIZE:
+            await _write_chunk(db, batch, report)
+            batch = []
+    if batch:
+        await _write_chunk(db, batch, report)
+    return report
+
+def _export_query():
+    table, images = models.Product.__table__, models.ProductImage.__table__
+    image_urls = (
+        select(func.string_agg(images.c.image_url, aggregate_order_by(literal_column(f"'{IMAGE_SEPARATOR}'"), images.c.sort_order)))
+        .where(images.c.product_id == table.c.id)
+        .scalar_subquery()
+    )
+    return select(table.c.id, *(table.c[name] for name in PRODUCT_FIELDS), image_urls.label("image_urls")).order_by(table.c.id)
+
+async def stream_export(fmt: str) -> AsyncIterator[str]:
+    """Yield the catalog chunk by chunk from a server-side cursor, in the import format"""
+    columns = ["id", *PRODUCT_FIELDS, "image_urls"]
+    if fmt == "csv":
+        yield ",".join(columns) + "\r\n"
+    # Opens its own session: request-scoped dependencies are closed before a streamed body is sent
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(_export_query().execution_options(yield_per=BULK_CHUNK_SIZE))
+        async for rows in result.partitions():
+            buffer = io.StringIO()
+            if fmt == "csv":
+                csv.writer(buffer).writerows(rows)
+            else:
+                for row in rows:
+                    data = dict(row._mapping)
+                    urls = data.pop("image_urls")
+                    data["images"] = _images_from_urls(urls) if urls else []
+                    buffer.write(json.dumps(data) + "\n")
+            yield buffer.getvalue()
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_products(
+    request: Request,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_async_db),
+    admin: dict = Depends(get_current_admin)
+):
+    """Create or update products from a CSV/NDJSON request body, keyed by slug (admin only).
+
+    CSV columns are the ProductCreate fields plus `image_urls` ("|"-separated).
+    Existing products only change in the columns (or JSON keys) a row provides;
+    empty CSV cells leave the stored value alone.
+    Invalid rows are skipped and reported with their row number.
+    """
+    return await run_import(db, request.stream(), fmt)
+
+@router.get("/export")
+async def export_products(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    admin: dict = Depends(get_current_admin)
+):
+    """Stream the whole catalog in the import format (admin only)"""
+    return StreamingResponse(
+        stream_export(fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=products.{fmt}"}
+    )
+
+async def _read_file(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 16):
+            yield chunk
+
+async def _main(args):
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    try:
+        if args.command == "import":
+            async with AsyncSessionLocal() as db:
+                report = await run_import(db, _read_file(args.path), fmt)
+            print(json.dumps(report.dict(), indent=2))
+        else:
+            with open(args.path, "w", newline="") as f:
+                async for chunk in stream_export(fmt):
+                    f.write(chunk)
+            print(f"Exported catalog to {args.path}")
+    finally:
+        await close_async_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk product import/export")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    asyncio.run(_main(parser.parse_args()))
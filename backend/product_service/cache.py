@@ -0,0 +1,102 @@
+"""Read-through Redis cache for storefront catalog reads"""
+import asyncio
+import json
+import os
+import uuid
+from typing import Any, Awaitable, Callable, List
+
+import redis
+import redis.asyncio as aioredis
+
+from shared.redis_client import AsyncRedisClient
+
+PRODUCT_CACHE_TTL = int(os.getenv("PRODUCT_CACHE_TTL", "300"))
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "900"))
+
+# Single-flight: only the lock holder rebuilds an expired entry, everyone else waits for it
+LOCK_TTL_MS = 5000
+LOCK_WAIT_STEP = 0.05
+LOCK_WAIT_STEPS = 40
+
+# Every invalidation bumps a per-key version; a rebuild only stores its payload if the
+# version is still the one it saw before loading, so a read that raced a write never
+# puts the pre-write value back for a whole TTL
+VERSION_TTL = 86400
+_SET_IF_CURRENT = """
+if (redis.call('get', KEYS[2]) or '') == ARGV[1] then
+    return redis.call('setex', KEYS[1], ARGV[2], ARGV[3])
+end
+return 0
+"""
+
+CATEGORIES_KEY = "catalog:categories"
+ATTRIBUTES_KEY = "catalog:attributes"
+
+def product_key(product_id: int) -> str:
+    return f"catalog:product:{product_id}"
+
+def _version_key(key: str) -> str:
+    return f"version:{key}"
+
+async def _release_lock(client: aioredis.Redis, lock_key: str, token: str):
+    # Only delete the lock if it is still ours (it may have expired and been re-taken)
+    await client.eval(
+        "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0",
+        1, lock_key, token
+    )
+
+async def cached(key: str, ttl: int, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """Return the JSON payload under `key`, building it with `loader` on a miss.
+
+    `loader` returns a JSON-serializable value, or None for "not found" (never cached).
+    Redis outages degrade to calling the loader directly.
+    """
+    try:
+        client = AsyncRedisClient.get_client()
+        payload = await client.get(key)
+        if payload is not None:
+            return json.loads(payload)
+
+        lock_key, token = f"lock:{key}", uuid.uuid4().hex
+        if not await client.set(lock_key, token, nx=True, px=LOCK_TTL_MS):
+            for _ in range(LOCK_WAIT_STEPS):
+                await asyncio.sleep(LOCK_WAIT_STEP)
+                payload = await client.get(key)
+                if payload is not None:
+                    return json.loads(payload)
+                if not await client.exists(lock_key):
+                    break
+            return await loader()
+
+        try:
+            version = await client.get(_version_key(key)) or ""
+            value = await loader()
+            if value is not None:
+                await client.eval(_SET_IF_CURRENT, 2, key, _version_key(key), version, ttl, json.dumps(value))
+            return value
+        finally:
+            await _release_lock(client, lock_key, token)
+    except redis.RedisError as e:
+        print(f"Catalog cache error: {e}")
+        return await loader()
+
+async def get_many(keys: List[str]) -> List[Any]:
+    """Cached payloads for `keys` in one MGET; None for misses, or for everything if Redis is down"""
+    try:
+        payloads = await AsyncRedisClient.get_client().mget(keys)
+    except redis.RedisError as e:
+        print(f"Catalog cache error: {e}")
+        return [None] * len(keys)
+    return [json.loads(payload) if payload is not None else None for payload in payloads]
+
+async def invalidate(*keys: str):
+    """Drop cached payloads after a write has committed, and stop in-flight rebuilds from restoring them"""
+    try:
+        pipe = AsyncRedisClient.get_client().pipeline(transaction=True)
+        for key in keys:
+            pipe.incr(_version_key(key))
+            pipe.expire(_version_key(key), VERSION_TTL)
+        pipe.delete(*keys)
+        await pipe.execute()
+    except redis.RedisError as e:
+        print(f"Catalog cache invalidation error: {e}")
@@ -1,10 +1,14 @@
 """Product Service - Product catalog and inventory management"""
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
 
-from shared.database import init_db
-from . import models, routes
+from shared.database import async_engine, ensure_indexes, init_async_db, close_async_db
+from shared.redis_client import AsyncRedisClient
+from shared.sql_metrics import instrument_app
+from . import bulk, models, reservations, routes
+from .search import ensure_search_index
 
 app = FastAPI(
     title="Product Service",
@@ -20,14 +24,26 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+instrument_app(app)
 
 # Initialize database
 @app.on_event("startup")
 async def startup_event():
-    init_db()
-    models.Base.metadata.create_all(bind=models.engine)
+    await init_async_db()
+    async with async_engine.begin() as conn:
+        await ensure_search_index(conn)
+        await ensure_indexes(conn, models.Product.__table__, models.ProductImage.__table__)
+    app.state.reservation_sweeper = asyncio.create_task(reservations.run_expiry_sweeper())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.reservation_sweeper.cancel()
+    await close_async_db()
+    await AsyncRedisClient.close()
 
 # Include routes
+app.include_router(reservations.router, prefix="/reservations", tags=["reservations"])
+app.include_router(bulk.router, tags=["bulk"])
 app.include_router(routes.router, tags=["products"])
 
 @app.get("/health")
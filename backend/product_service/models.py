@@ -1,9 +1,19 @@
 """Database models for product service"""
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Index, Computed, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from shared.database import Base, engine
 
+# 'simple' skips stemming so prefix queries match what the shopper is typing.
+# Name and SKU outrank the short description, which outranks the long description.
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(sku, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(short_description, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+)
+
 class Category(Base):
     __tablename__ = "categories"
 
@@ -40,16 +50,25 @@ class Product(Base):
     is_featured = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Maintained by Postgres on every insert/update; never loaded unless asked for
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
     
     category = relationship("Category", back_populates="products")
     images = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan")
     variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan")
 
+    # Keyset pagination seeks on (sort key, id)
+    __table_args__ = (
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
 class ProductImage(Base):
     __tablename__ = "product_images"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     image_url = Column(String, nullable=False)
     alt_text = Column(String)
     is_primary = Column(Boolean, default=False)
@@ -92,3 +111,27 @@ class ProductVariantAttribute(Base):
     
     variant = relationship("ProductVariant", back_populates="attributes")
     option = relationship("AttributeOption")
+
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+    id = Column(Integer, primary_key=True, index=True)
+    order_ref = Column(String, unique=True, index=True, nullable=False)
+    status = Column(String, default="held", nullable=False)  # held, committed, released, expired
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    items = relationship("StockReservationItem", back_populates="reservation", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_stock_reservations_held_expiry", "expires_at", postgresql_where=text("status = 'held'")),
+    )
+
+class StockReservationItem(Base):
+    __tablename__ = "stock_reservation_items"
+    id = Column(Integer, primary_key=True, index=True)
+    reservation_id = Column(Integer, ForeignKey("stock_reservations.id"), nullable=False, index=True)
+    product_id = Column(Integer, nullable=False)
+    variant_id = Column(Integer, nullable=True)  # stock is held on the variant when set
+    quantity = Column(Integer, nullable=False)
+
+    reservation = relationship("StockReservation", back_populates="items")
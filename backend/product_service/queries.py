@@ -0,0 +1,93 @@
+"""Query building blocks for product service reads: loader profiles, snapshots and keyset pagination"""
+from typing import Iterable, Optional
+import json
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from shared import pagination
+from . import models
+
+def variant_response_options():
+    """Eager loads for the ProductVariantResponse graph (variant -> attributes -> option)"""
+    return (
+        selectinload(models.ProductVariant.attributes)
+        .joinedload(models.ProductVariantAttribute.option),
+    )
+
+def product_response_options():
+    """Eager loads for the full ProductResponse graph.
+
+    Many-to-one links are joined into the parent SELECT and collections use one
+    IN-query each, so a page costs the same number of statements whatever its size.
+    """
+    return (
+        joinedload(models.Product.category),
+        selectinload(models.Product.images),
+        selectinload(models.Product.variants)
+        .selectinload(models.ProductVariant.attributes)
+        .joinedload(models.ProductVariantAttribute.option),
+    )
+
+SNAPSHOT_FIELDS = ("id", "name", "slug", "price", "compare_price", "stock_quantity", "is_active")
+
+def snapshot_query(ids: Iterable[int]):
+    """ProductSnapshot rows for `ids` in one primary-key lookup, primary image included"""
+    image = models.ProductImage
+    image_url = (
+        select(image.image_url)
+        .where(image.product_id == models.Product.id)
+        .order_by(image.is_primary.desc(), image.sort_order, image.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return select(
+        models.Product.id,
+        models.Product.name,
+        models.Product.slug,
+        models.Product.price,
+        models.Product.compare_price,
+        func.coalesce(models.Product.stock_quantity, 0).label("stock_quantity"),
+        func.coalesce(models.Product.is_active, True).label("is_active"),
+        image_url.label("image_url"),
+    ).where(models.Product.id.in_(list(ids)))
+
+def snapshot_from_payload(payload: dict) -> dict:
+    """Project a cached ProductResponse payload down to a ProductSnapshot"""
+    images = sorted(payload.get("images") or [], key=lambda i: (not i["is_primary"], i["sort_order"], i["id"]))
+    snapshot = {field: payload[field] for field in SNAPSHOT_FIELDS}
+    snapshot["image_url"] = images[0]["image_url"] if images else None
+    return snapshot
+
+# Keyset pagination: sort name -> (key column, descending)
+PRODUCT_SORTS = {
+    "newest": (models.Product.created_at, True),
+    "price_asc": (models.Product.price, False),
+    "price_desc": (models.Product.price, True),
+}
+
+def encode_cursor(sort: str, product: models.Product) -> str:
+    """Opaque cursor pointing just past `product` in the given sort order"""
+    column, _ = PRODUCT_SORTS[sort]
+    return pagination.encode_cursor(sort, getattr(product, column.key), product.id)
+
+def apply_keyset(query, sort: str, cursor: Optional[str] = None):
+    """Order `query` by (sort key, id) and seek past `cursor` instead of using OFFSET"""
+    column, descending = PRODUCT_SORTS[sort]
+    return pagination.apply_keyset(query, sort, column, models.Product.id, descending, cursor)
+
+async def estimate_count(db: AsyncSession, query) -> int:
+    """Planner row estimate for the filtered, unpaginated `query`; avoids scanning it like COUNT(*).
+
+    Pass the row query itself: a COUNT(*) wrapper's top node is an Aggregate estimated at one row.
+    """
+    conn = await db.connection()
+    # Bound parameters, not literal_binds: search filters carry values (regconfig) with no literal form
+    compiled = query.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
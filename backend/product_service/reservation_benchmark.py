@@ -0,0 +1,83 @@
+"""Checkout contention benchmark: many buyers racing for the last units of one SKU.
+
+Creates a throwaway product with --stock units, fires --buyers concurrent
+POST /reservations at the real app (in-process), then checks that exactly
+--stock holds were granted and the product never went negative. The product
+and its reservations are removed afterwards, so any database with the product
+tables will do:
+
+Usage: DATABASE_URL=postgresql://.../bench SLOW_QUERY_MS=600000 \
+           python -m product_service.reservation_benchmark [--buyers 1000] [--stock 100]
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+from sqlalchemy import delete, select
+
+from shared.auth_middleware import INTERNAL_SERVICE_TOKEN
+from shared.database import AsyncSessionLocal, init_async_db, close_async_db
+from . import models
+from .main import app
+
+async def buy_concurrently(client: httpx.AsyncClient, product_id: int, buyers: int, ref_prefix: str) -> tuple:
+    """Every buyer tries to reserve one unit at once; returns (status codes, latencies in ms)"""
+    async def buy(n: int):
+        start = time.perf_counter()
+        response = await client.post(
+            "/reservations",
+            json={"order_ref": f"{ref_prefix}-{n}", "items": [{"product_id": product_id, "quantity": 1}]},
+            headers={"X-Internal-Token": INTERNAL_SERVICE_TOKEN}
+        )
+        return response.status_code, (time.perf_counter() - start) * 1000
+
+    results = await asyncio.gather(*(buy(n) for n in range(buyers)))
+    return [code for code, _ in results], [ms for _, ms in results]
+
+async def main(args) -> bool:
+    await init_async_db()
+    ref_prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    async with AsyncSessionLocal() as db:
+        product = models.Product(name="Benchmark SKU", slug=ref_prefix, price=1, stock_quantity=args.stock)
+        db.add(product)
+        await db.commit()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            codes, timings = await buy_concurrently(client, product.id, args.buyers, ref_prefix)
+            elapsed = time.perf_counter() - start
+
+        async with AsyncSessionLocal() as db:
+            remaining = await db.scalar(select(models.Product.stock_quantity).where(models.Product.id == product.id))
+            held = await db.scalar(
+                select(models.StockReservation.id).where(models.StockReservation.order_ref.like(f"{ref_prefix}-%")).limit(1)
+            )
+        won, lost = codes.count(201), codes.count(409)
+        timings.sort()
+        print(f"{args.buyers} buyers for {args.stock} units: {won} reserved, {lost} sold out, "
+              f"{len(codes) - won - lost} errors, {remaining} left")
+        print(f"  {args.buyers / elapsed:,.0f} reservations/s  p50 {statistics.median(timings):.1f} ms  "
+              f"p99 {timings[max(0, round(len(timings) * 0.99) - 1)]:.1f} ms")
+        expected = min(args.stock, args.buyers)
+        ok = won == expected and lost == args.buyers - expected and remaining == args.stock - expected and (held is not None) == (expected > 0)
+        if not ok:
+            print("  FAILED: holds granted do not match the stock taken")
+        return ok
+    finally:
+        async with AsyncSessionLocal() as db:
+            reservations = select(models.StockReservation.id).where(models.StockReservation.order_ref.like(f"{ref_prefix}-%"))
+            await db.execute(delete(models.StockReservationItem).where(models.StockReservationItem.reservation_id.in_(reservations)))
+            await db.execute(delete(models.StockReservation).where(models.StockReservation.id.in_(reservations)))
+            await db.execute(delete(models.Product).where(models.Product.id == product.id))
+            await db.commit()
+        await close_async_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent stock reservation benchmark on a single SKU")
+    parser.add_argument("--buyers", type=int, default=1000, help="concurrent buyers, one unit each")
+    parser.add_argument("--stock", type=int, default=100, help="units on hand before the rush")
+    sys.exit(0 if asyncio.run(main(parser.parse_args())) else 1)
@@ -0,0 +1,171 @@
+"""Stock reservations: hold inventory for an order until it is confirmed, cancelled or expires"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import Integer, column, func, select, update, values
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Set
+import asyncio
+import os
+
+from shared.database import AsyncSessionLocal, get_async_db
+from shared.auth_middleware import verify_internal_service
+from . import cache, models, schemas
+
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", "900"))
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))
+RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", "100"))
+
+router = APIRouter(dependencies=[Depends(verify_internal_service)])
+
+async def _adjust_stock(db: AsyncSession, table, lines: Dict[int, int], take: bool) -> Set[int]:
+    """Take (or give back) stock for every line in one UPDATE ... FROM (VALUES ...).
+
+    When taking, rows without enough stock are left untouched; the ids that were
+    updated are returned so the caller can tell which lines came up short.
+    """
+    if not lines:
+        return set()
+    batch = values(column("id", Integer), column("qty", Integer), name="lines").data(sorted(lines.items()))
+    stmt = update(table).where(table.c.id == batch.c.id)
+    if take:
+        stmt = stmt.where(table.c.stock_quantity >= batch.c.qty).values(stock_quantity=table.c.stock_quantity - batch.c.qty)
+    else:
+        stmt = stmt.values(stock_quantity=table.c.stock_quantity + batch.c.qty)
+    result = await db.execute(stmt.returning(table.c.id))
+    return set(result.scalars().all())
+
+def _group_lines(items: Iterable) -> tuple:
+    """Sum quantities per product and per variant"""
+    products: Dict[int, int] = {}
+    variants: Dict[int, int] = {}
+    for item in items:
+        if item.variant_id:
+            variants[item.variant_id] = variants.get(item.variant_id, 0) + item.quantity
+        else:
+            products[item.product_id] = products.get(item.product_id, 0) + item.quantity
+    return products, variants
+
+async def _take_stock(db: AsyncSession, items: Iterable):
+    """Take stock for every line, or roll back and raise 409 naming the lines that came up short"""
+    products, variants = _group_lines(items)
+    taken_products = await _adjust_stock(db, models.Product.__table__, products, take=True)
+    taken_variants = await _adjust_stock(db, models.ProductVariant.__table__, variants, take=True)
+    short_products = sorted(set(products) - taken_products)
+    short_variants = sorted(set(variants) - taken_variants)
+    if short_products or short_variants:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Insufficient stock", "product_ids": short_products, "variant_ids": short_variants}
+        )
+
+async def _release(db: AsyncSession, reservation: models.StockReservation, new_status: str = "released"):
+    products, variants = _group_lines(reservation.items)
+    await _adjust_stock(db, models.Product.__table__, products, take=False)
+    await _adjust_stock(db, models.ProductVariant.__table__, variants, take=False)
+    reservation.status = new_status
+
+async def _invalidate(reservation: models.StockReservation):
+    await cache.invalidate(*{cache.product_key(item.product_id) for item in reservation.items})
+
+async def _get_reservation(db: AsyncSession, order_ref: str, lock: bool = False) -> Optional[models.StockReservation]:
+    query = (
+        select(models.StockReservation)
+        .options(selectinload(models.StockReservation.items))
+        .where(models.StockReservation.order_ref == order_ref)
+    )
+    if lock:
+        query = query.with_for_update()
+    return await db.scalar(query)
+
+@router.post("", response_model=schemas.ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def create_reservation(data: schemas.ReservationCreate, db: AsyncSession = Depends(get_async_db)):
+    """Atomically hold stock for every line of an order (idempotent per order_ref)"""
+    existing = await _get_reservation(db, data.order_ref)
+    if existing:
+        return existing
+
+    await _take_stock(db, data.items)
+
+    ttl = data.ttl_seconds or RESERVATION_TTL_SECONDS
+    reservation = models.StockReservation(
+        order_ref=data.order_ref,
+        status="held",
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=ttl),
+        items=[models.StockReservationItem(**item.dict()) for item in data.items]
+    )
+    db.add(reservation)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent retry for the same order won the race; its hold stands, ours is rolled back
+        await db.rollback()
+        return await _get_reservation(db, data.order_ref)
+    await _invalidate(reservation)
+    return reservation
+
+@router.post("/{order_ref}/commit", response_model=schemas.ReservationResponse)
+async def commit_reservation(order_ref: str, db: AsyncSession = Depends(get_async_db)):
+    """Make a hold permanent once the order is confirmed (placed, or paid for card orders)"""
+    reservation = await _get_reservation(db, order_ref, lock=True)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    if reservation.status == "released":
+        raise HTTPException(status_code=409, detail="Reservation was already released")
+    expired = reservation.status == "expired"
+    if expired:
+        # The hold lapsed before confirmation arrived; take the stock again if it is still there
+        await _take_stock(db, reservation.items)
+    reservation.status = "committed"
+    await db.commit()
+    if expired:
+        await _invalidate(reservation)
+    return reservation
+
+@router.post("/{order_ref}/release", response_model=schemas.ReservationResponse)
+async def release_reservation(order_ref: str, db: AsyncSession = Depends(get_async_db)):
+    """Return held (or committed, for cancellations) stock to inventory"""
+    reservation = await _get_reservation(db, order_ref, lock=True)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    if reservation.status == "expired":
+        # Stock already went back when the hold expired; just make sure it is never re-taken
+        reservation.status = "released"
+        await db.commit()
+    elif reservation.status != "released":
+        await _release(db, reservation)
+        await db.commit()
+        await _invalidate(reservation)
+    return reservation
+
+async def release_expired() -> int:
+    """Release one batch of holds whose TTL has passed; returns how many were released"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(models.StockReservation)
+            .options(selectinload(models.StockReservation.items))
+            .where(models.StockReservation.status == "held", models.StockReservation.expires_at <= func.now())
+            .order_by(models.StockReservation.expires_at)
+            .limit(RESERVATION_SWEEP_BATCH)
+            .with_for_update(skip_locked=True)
+        )
+        expired = result.scalars().all()
+        for reservation in expired:
+            await _release(db, reservation, "expired")
+        await db.commit()
+    for reservation in expired:
+        await _invalidate(reservation)
+    return len(expired)
+
+async def run_expiry_sweeper():
+    """Background loop releasing expired holds (e.g. abandoned payments or orders that never committed)"""
+    while True:
+        try:
+            released = await release_expired()
+        except Exception as e:
+            print(f"Reservation sweeper error: {e}")
+            released = 0
+        if released < RESERVATION_SWEEP_BATCH:
+            await asyncio.sleep(RESERVATION_SWEEP_INTERVAL)
@@ -1,40 +1,66 @@
 """API routes for product service"""
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy import func, select
+from typing import List, Optional
 import math
 
-from shared.database import get_db
+from shared.database import get_async_db
 from shared.auth_middleware import get_current_admin
-from . import models, schemas
+from . import cache, models, schemas
+from .queries import (
+    apply_keyset,
+    encode_cursor,
+    estimate_count,
+    product_response_options,
+    snapshot_from_payload,
+    snapshot_query,
+    variant_response_options,
+)
+from .search import SEARCH_MAX_CANDIDATES, apply_search, exact_match_filter
 
 router = APIRouter()
 
+async def _get_product(db: AsyncSession, product_id: int) -> Optional[models.Product]:
+    result = await db.execute(
+        select(models.Product)
+        .options(*product_response_options())
+        .where(models.Product.id == product_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
 # Category Routes
 @router.post("/categories", response_model=schemas.CategoryResponse, status_code=status.HTTP_201_CREATED)
 async def create_category(
     category_data: schemas.CategoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin: dict = Depends(get_current_admin)
 ):
     """Create a new category (admin only)"""
     category = models.Category(**category_data.dict())
     db.add(category)
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    await db.refresh(category)
+    await cache.invalidate(cache.CATEGORIES_KEY)
     return category
 
 @router.get("/categories", response_model=list[schemas.CategoryResponse])
-async def list_categories(db: Session = Depends(get_db)):
+async def list_categories(db: AsyncSession = Depends(get_async_db)):
     """List all active categories"""
-    categories = db.query(models.Category).filter(models.Category.is_active == True).all()
-    return categories
+    async def load():
+        result = await db.execute(select(models.Category).where(models.Category.is_active == True))
+        return [
+            schemas.CategoryResponse.model_validate(c).model_dump(mode="json")
+            for c in result.scalars().all()
+        ]
+    return await cache.cached(cache.CATEGORIES_KEY, cache.CATALOG_CACHE_TTL, load)
 
 @router.get("/categories/{category_id}", response_model=schemas.CategoryResponse)
-async def get_category(category_id: int, db: Session = Depends(get_db)):
+async def get_category(category_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get category by ID"""
-    category = db.query(models.Category).filter(models.Category.id == category_id).first()
+    category = await db.get(models.Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     return category
@@ -43,83 +69,118 @@ async def get_category(category_id: int, db: Session = Depends(get_db)):
 @router.post("/attributes", response_model=schemas.AttributeResponse, status_code=status.HTTP_201_CREATED)
 async def create_attribute(
     attribute_data: schemas.AttributeCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin: dict = Depends(get_current_admin)
 ):
     attr = models.Attribute(**attribute_data.dict())
     db.add(attr)
-    db.commit()
-    db.refresh(attr)
+    await db.commit()
+    await db.refresh(attr, ["options"])
+    await cache.invalidate(cache.ATTRIBUTES_KEY)
     return attr
 
 @router.get("/attributes", response_model=list[schemas.AttributeResponse])
-async def list_attributes(db: Session = Depends(get_db)):
-    return db.query(models.Attribute).all()
+async def list_attributes(db: AsyncSession = Depends(get_async_db)):
+    async def load():
+        result = await db.execute(select(models.Attribute).options(selectinload(models.Attribute.options)))
+        return [
+            schemas.AttributeResponse.model_validate(a).model_dump(mode="json")
+            for a in result.scalars().all()
+        ]
+    return await cache.cached(cache.ATTRIBUTES_KEY, cache.CATALOG_CACHE_TTL, load)
 
 @router.post("/attribute-options", response_model=schemas.AttributeOptionResponse, status_code=status.HTTP_201_CREATED)
 async def create_attribute_option(
     option_data: schemas.AttributeOptionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin: dict = Depends(get_current_admin)
 ):
     opt = models.AttributeOption(**option_data.dict())
     db.add(opt)
-    db.commit()
-    db.refresh(opt)
+    await db.commit()
+    await db.refresh(opt)
+    await cache.invalidate(cache.ATTRIBUTES_KEY)
     return opt
 
 # Product Routes
 @router.post("/", response_model=schemas.ProductResponse, status_code=status.HTTP_201_CREATED)
 async def create_product(
     product_data: schemas.ProductCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin: dict = Depends(get_current_admin)
 ):
     """Create a new product (admin only)"""
     # Extract images data
     images_data = product_data.images
     product_dict = product_data.dict(exclude={"images"})
-    
+
     # Create product
     product = models.Product(**product_dict)
     db.add(product)
-    db.flush()
-    
+    await db.flush()
+
     # Add images
     for img_data in images_data:
         image = models.ProductImage(**img_data.dict(), product_id=product.id)
         db.add(image)
-    
-    db.commit()
-    db.refresh(product)
-    return product
+
+    await db.commit()
+    await cache.invalidate(cache.product_key(product.id))
+    return await _get_product(db, product.id)
+
+@router.post("/batch", response_model=List[schemas.ProductSnapshot])
+async def batch_products(data: schemas.ProductBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """Price/stock/name snapshots for many products in one call.
+
+    Products already in the catalog cache are projected from it; the rest come from
+    a single primary-key lookup. Unknown ids are left out of the response.
+    """
+    ids = list(dict.fromkeys(data.ids))
+    payloads = await cache.get_many([cache.product_key(product_id) for product_id in ids])
+    snapshots = {pid: snapshot_from_payload(payload) for pid, payload in zip(ids, payloads) if payload}
+    missing = [pid for pid in ids if pid not in snapshots]
+    if missing:
+        result = await db.execute(snapshot_query(missing))
+        snapshots.update({row.id: dict(row._mapping) for row in result})
+    return [snapshots[pid] for pid in ids if pid in snapshots]
 
 @router.post("/{product_id}/variants", response_model=schemas.ProductVariantResponse)
 async def create_product_variant(
     product_id: int,
     variant_data: schemas.ProductVariantCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin: dict = Depends(get_current_admin)
 ):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    product = await db.get(models.Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    
+
     variant_dict = variant_data.dict(exclude={"attribute_option_ids"})
     variant = models.ProductVariant(**variant_dict, product_id=product_id)
     db.add(variant)
-    db.flush()
-    
+    await db.flush()
+
     for opt_id in variant_data.attribute_option_ids:
         db.add(models.ProductVariantAttribute(variant_id=variant.id, option_id=opt_id))
-    
-    db.commit()
-    db.refresh(variant)
-    return variant
+
+    await db.commit()
+    await cache.invalidate(cache.product_key(product_id))
+    result = await db.execute(
+        select(models.ProductVariant)
+        .options(*variant_response_options())
+        .where(models.ProductVariant.id == variant.id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
 
 @router.get("/{product_id}/variants", response_model=List[schemas.ProductVariantResponse])
-async def list_product_variants(product_id: int, db: Session = Depends(get_db)):
-    return db.query(models.ProductVariant).filter(models.ProductVariant.product_id == product_id).all()
+async def list_product_variants(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(models.ProductVariant)
+        .options(*variant_response_options())
+        .where(models.ProductVariant.product_id == product_id)
+    )
+    return result.scalars().all()
 
 @router.get("/", response_model=schemas.ProductListResponse)
 async def list_products(
@@ -130,54 +191,103 @@ async def list_products(
     is_featured: Optional[bool] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    db: Session = Depends(get_db)
+    sort: Optional[str] = Query(None, pattern="^(relevance|newest|price_asc|price_desc)$"),
+    cursor: Optional[str] = None,
+    total_mode: str = Query("exact", alias="total", pattern="^(exact|estimate|none)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """List products with pagination and filters"""
-    query = db.query(models.Product).filter(models.Product.is_active == True)
-    
+    """List products with pagination and filters.
+
+    Pass the returned `next_cursor` back as `cursor` to seek by (sort key, id) instead of
+    OFFSET; `total=estimate` or `total=none` skips the COUNT over the filtered set.
+    Searches default to relevance order, which pages by offset only and covers at most
+    SEARCH_MAX_CANDIDATES matches (the total is capped to match).
+    """
+    sort = sort or ("relevance" if search else "newest")
+    if sort == "relevance" and cursor:
+        raise HTTPException(status_code=400, detail="Cursor pagination is not available for relevance ordering")
+
+    query = select(models.Product).where(models.Product.is_active == True)
+
     # Apply filters
     if category_id:
-        query = query.filter(models.Product.category_id == category_id)
-    
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                models.Product.name.ilike(search_term),
-                models.Product.description.ilike(search_term),
-                models.Product.sku.ilike(search_term)
-            )
-        )
-    
+        query = query.where(models.Product.category_id == category_id)
+
     if is_featured is not None:
-        query = query.filter(models.Product.is_featured == is_featured)
-    
+        query = query.where(models.Product.is_featured == is_featured)
+
     if min_price is not None:
-        query = query.filter(models.Product.price >= min_price)
-    
+        query = query.where(models.Product.price >= min_price)
+
     if max_price is not None:
-        query = query.filter(models.Product.price <= max_price)
-    
+        query = query.where(models.Product.price <= max_price)
+
+    rank = None
+    if search:
+        # A scanned barcode or typed SKU short-circuits the full-text search
+        result = await db.execute(query.where(exact_match_filter(search)).options(*product_response_options()))
+        exact = result.scalars().all()
+        if exact:
+            return {
+                "products": exact,
+                "total": len(exact),
+                "page": 1,
+                "page_size": page_size,
+                "total_pages": 1,
+                "next_cursor": None
+            }
+        query, rank = apply_search(query, search, SEARCH_MAX_CANDIDATES if sort == "relevance" else None)
+
     # Get total count
-    total = query.count()
-    total_pages = math.ceil(total / page_size)
-    
-    # Apply pagination
-    offset = (page - 1) * page_size
-    products = query.offset(offset).limit(page_size).all()
-    
+    total = total_pages = None
+    if total_mode == "exact":
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    elif total_mode == "estimate":
+        total = await estimate_count(db, query)
+    if total is not None:
+        total_pages = math.ceil(total / page_size)
+
+    # Apply pagination; one extra row tells us whether a next page exists
+    if sort == "relevance":
+        if rank is not None:
+            query = query.order_by(rank.desc(), models.Product.id.desc())
+        else:
+            query = query.order_by(models.Product.id.desc())
+    else:
+        try:
+            query = apply_keyset(query, sort, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if not cursor:
+        query = query.offset((page - 1) * page_size)
+    result = await db.execute(query.options(*product_response_options()).limit(page_size + 1))
+    products = result.scalars().all()
+
+    next_cursor = None
+    if len(products) > page_size:
+        products = products[:page_size]
+        if sort != "relevance":
+            next_cursor = encode_cursor(sort, products[-1])
+
     return {
         "products": products,
         "total": total,
         "page": page,
         "page_size": page_size,
-        "total_pages": total_pages
+        "total_pages": total_pages,
+        "next_cursor": next_cursor
     }
 
 @router.get("/{product_id}", response_model=schemas.ProductResponse)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get product by ID"""
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    async def load():
+        product = await _get_product(db, product_id)
+        if product is None:
+            return None
+        return schemas.ProductResponse.model_validate(product).model_dump(mode="json")
+
+    product = await cache.cached(cache.product_key(product_id), cache.PRODUCT_CACHE_TTL, load)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
@@ -186,51 +296,53 @@ async def get_product(product_id: int, db: Session = Depends(get_db)):
 async def update_product(
     product_id: int,
     product_data: schemas.ProductUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin: dict = Depends(get_current_admin)
 ):
     """Update product (admin only)"""
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    product = await db.get(models.Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    
+
     # Update fields
     update_data = product_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(product, field, value)
-    
-    db.commit()
-    db.refresh(product)
-    return product
+
+    await db.commit()
+    await cache.invalidate(cache.product_key(product_id))
+    return await _get_product(db, product_id)
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_product(
     product_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin: dict = Depends(get_current_admin)
 ):
     """Delete product (admin only)"""
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    product = await _get_product(db, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    
-    db.delete(product)
-    db.commit()
+
+    await db.delete(product)
+    await db.commit()
+    await cache.invalidate(cache.product_key(product_id))
     return None
 
 @router.post("/{product_id}/stock")
 async def update_stock(
     product_id: int,
     quantity: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_admin: dict = Depends(get_current_admin)
 ):
     """Update product stock quantity (admin only)"""
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    product = await db.get(models.Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    
+
     product.stock_quantity = quantity
-    db.commit()
-    
+    await db.commit()
+    await cache.invalidate(cache.product_key(product_id))
+
     return {"message": "Stock updated", "new_quantity": quantity}
@@ -135,7 +135,60 @@ class ProductResponse(ProductBase):
 
 class ProductListResponse(BaseModel):
     products: List[ProductResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+# Batch Lookup Schemas
+MAX_BATCH_IDS = 100
+
+class ProductBatchRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+
+class ProductSnapshot(BaseModel):
+    """Compact projection used to (re)price carts and orders"""
+    id: int
+    name: str
+    slug: str
+    price: float
+    compare_price: Optional[float] = None
+    stock_quantity: int
+    is_active: bool
+    image_url: Optional[str] = None
+
+# Stock Reservation Schemas
+class ReservationLine(BaseModel):
+    product_id: int
+    variant_id: Optional[int] = None
+    quantity: int = Field(..., gt=0)
+
+    class Config:
+        from_attributes = True
+
+class ReservationCreate(BaseModel):
+    order_ref: str = Field(..., min_length=1, max_length=100)
+    items: List[ReservationLine] = Field(..., min_length=1)
+    ttl_seconds: Optional[int] = Field(None, gt=0, le=86400)
+
+class ReservationResponse(BaseModel):
+    order_ref: str
+    status: str
+    expires_at: datetime
+    items: List[ReservationLine]
+
+    class Config:
+        from_attributes = True
+
+# Bulk Import Schemas
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class ImportReport(BaseModel):
+    processed: int = 0
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
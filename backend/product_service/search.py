@@ -0,0 +1,53 @@
+"""Full-text product search backed by a generated tsvector column and GIN index"""
+import os
+import re
+
+from sqlalchemy import false, func, or_, select, text
+from typing import Optional
+
+from . import models
+from .models import SEARCH_VECTOR_SQL
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Relevance searches rank (and count) at most this many matches; a short typeahead
+# prefix can match most of the catalog, and ranking every match costs seconds at 1M rows
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "1000"))
+
+def build_tsquery(term: str):
+    """AND together the words of `term`, treating the last one as a prefix for typeahead"""
+    tokens = _TOKEN_RE.findall(term.lower())
+    if not tokens:
+        return None
+    parts = tokens[:-1] + [f"{tokens[-1]}:*"]
+    return func.to_tsquery("simple", " & ".join(parts))
+
+def exact_match_filter(term: str):
+    """SKU/barcode equality, served by their unique B-tree indexes"""
+    term = term.strip()
+    return or_(models.Product.sku == term, models.Product.barcode == term)
+
+def apply_search(query, term: str, max_candidates: Optional[int] = None):
+    """Restrict `query` to full-text matches of `term`; returns (query, rank expression).
+
+    With `max_candidates`, only the first that many matches off the GIN index are kept,
+    so ranking and counting stay bounded however broad the term is.
+    """
+    tsquery = build_tsquery(term)
+    if tsquery is None:
+        return query.where(false()), None
+    rank = func.ts_rank_cd(models.Product.search_vector, tsquery)
+    query = query.where(models.Product.search_vector.op("@@")(tsquery))
+    if max_candidates is not None:
+        candidates = query.with_only_columns(models.Product.id).limit(max_candidates)
+        query = select(models.Product).where(models.Product.id.in_(candidates))
+    return query, rank
+
+async def ensure_search_index(conn):
+    """Add the search column and index to a products table created before they existed"""
+    await conn.execute(text(
+        "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+    ))
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)"
+    ))
@@ -0,0 +1,128 @@
+"""Search latency benchmark: full-text listing vs. the old triple ILIKE, at several catalog sizes.
+
+Fills `products` with synthetic rows straight from generate_series, then times GET /?search=...
+through the real app (in-process) next to the leading-wildcard ILIKE it replaced.
+It TRUNCATES the catalog, so point DATABASE_URL at a disposable database:
+
+Usage: DATABASE_URL=postgresql://.../bench SLOW_QUERY_MS=600000 \
+           python -m product_service.search_benchmark --reset [--total exact|estimate|none] 100000 1000000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from sqlalchemy import func, or_, select, text
+
+from shared.database import AsyncSessionLocal, async_engine, ensure_indexes, init_async_db, close_async_db
+from . import models
+from .main import app
+from .search import ensure_search_index
+
+ADJECTIVES = ["red", "blue", "green", "black", "white", "classic", "slim", "organic", "premium", "vintage",
+              "wireless", "compact", "leather", "cotton", "steel", "bamboo", "smart", "ultra", "mini", "pro"]
+NOUNS = ["shirt", "jacket", "sneaker", "backpack", "watch", "lamp", "mug", "headphones", "kettle", "blender",
+         "keyboard", "speaker", "wallet", "scarf", "bottle", "chair", "desk", "camera", "charger", "notebook"]
+
+# (label, search term); SKU lookups take the exact-match shortcut
+TERMS = [
+    ("common word", "shirt"),
+    ("two words", "leather wallet"),
+    ("typeahead prefix", "headph"),
+    ("rare word", "zanzibar"),
+    ("sku", "SKU-0000042"),
+    ("no match", "qwertyuiop"),
+]
+
+def _seed_sql(count: int) -> str:
+    adjectives = "ARRAY[" + ",".join(f"'{w}'" for w in ADJECTIVES) + "]"
+    nouns = "ARRAY[" + ",".join(f"'{w}'" for w in NOUNS) + "]"
+    pick = lambda words, size, salt: f"({words})[1 + ((g * {salt}) % {size})]"
+    name = f"{pick(adjectives, len(ADJECTIVES), 7)} || ' ' || {pick(adjectives, len(ADJECTIVES), 13)} || ' ' || {pick(nouns, len(NOUNS), 1)}"
+    return f"""
+        INSERT INTO products (name, slug, sku, short_description, description, price, stock_quantity, low_stock_threshold, is_active, is_featured, created_at)
+        SELECT {name} || ' ' || g,
+               'bench-' || g,
+               'SKU-' || lpad(g::text, 7, '0'),
+               'A ' || {pick(adjectives, len(ADJECTIVES), 3)} || ' ' || {pick(nouns, len(NOUNS), 11)} || ' for everyday use',
+               repeat('Durable, well made and easy to care for. ', 5) || CASE WHEN g % 50000 = 0 THEN 'zanzibar' ELSE '' END,
+               round((5 + (g % 500))::numeric, 2),
+               g % 100,
+               10,
+               true,
+               g % 97 = 0,
+               now() - (g || ' seconds')::interval
+        FROM generate_series(1, {count}) AS g
+    """
+
+async def seed(count: int):
+    async with async_engine.begin() as conn:
+        await conn.execute(text("TRUNCATE products RESTART IDENTITY CASCADE"))
+        await conn.execute(text(_seed_sql(count)))
+    async with async_engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE products"))
+
+def _ilike_query(term: str):
+    pattern = f"%{term}%"
+    return select(models.Product).where(
+        models.Product.is_active == True,
+        or_(models.Product.name.ilike(pattern), models.Product.description.ilike(pattern), models.Product.sku.ilike(pattern))
+    )
+
+async def _time(fn, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def _summary(timings: list) -> str:
+    timings = sorted(timings)
+    p95 = timings[max(0, round(len(timings) * 0.95) - 1)]
+    return f"p50 {statistics.median(timings):8.1f} ms  p95 {p95:8.1f} ms"
+
+async def run(count: int, args, client: httpx.AsyncClient):
+    start = time.perf_counter()
+    await seed(count)
+    print(f"\n{count:,} products (seeded in {time.perf_counter() - start:.1f}s)")
+    for label, term in TERMS:
+        async def full_text():
+            response = await client.get("/", params={"search": term, "page_size": 20, "total": args.total})
+            response.raise_for_status()
+
+        async def ilike():
+            # What the old endpoint ran: a COUNT over the match set, then the first page
+            async with AsyncSessionLocal() as db:
+                query = _ilike_query(term)
+                await db.scalar(select(func.count()).select_from(query.subquery()))
+                (await db.execute(query.limit(20))).scalars().all()
+
+        await full_text()  # warm caches and the connection pool
+        print(f"  {label:<17} full-text {_summary(await _time(full_text, args.repeat))}   "
+              f"ilike {_summary(await _time(ilike, max(1, args.repeat // 5)))}")
+
+async def main(args):
+    await init_async_db()
+    async with async_engine.begin() as conn:
+        await ensure_search_index(conn)
+        await ensure_indexes(conn, models.Product.__table__)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            for count in args.counts:
+                await run(count, args, client)
+    finally:
+        await close_async_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Product search latency benchmark (truncates products!)")
+    parser.add_argument("counts", nargs="*", type=int, default=[100_000, 1_000_000])
+    parser.add_argument("--total", choices=["exact", "estimate", "none"], default="exact", help="total mode of the listing")
+    parser.add_argument("--repeat", type=int, default=20, help="timed requests per search term")
+    parser.add_argument("--reset", action="store_true", help="confirm that the products table may be truncated")
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("--reset is required: the benchmark truncates the products table")
+    asyncio.run(main(args))
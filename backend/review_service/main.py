@@ -1,17 +1,25 @@
 """Review Service - Product reviews and ratings (runs inside order_service or as separate)"""
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Index, bindparam, case, delete, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+import asyncio
 import os
+import uuid
 
-from shared.database import Base, engine, get_db, init_db
+import redis
+
+from shared.database import Base, AsyncSessionLocal, async_engine, ensure_indexes, get_async_db, init_async_db, close_async_db
 from shared.auth_middleware import get_current_user, get_current_admin
+from shared.pagination import apply_keyset, encode_cursor
+from shared.redis_client import AsyncRedisClient
+from shared.sql_metrics import instrument_app
 
 app = FastAPI(
     title="Review Service",
@@ -19,7 +27,8 @@ app = FastAPI(
     root_path=os.getenv("ROOT_PATH", "")
 )
 
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=False, allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=False, allow_methods=["*"], allow_headers=["*"], expose_headers=["X-Next-Cursor"])
+instrument_app(app)
 
 # Models
 class Review(Base):
@@ -36,6 +45,32 @@ class Review(Base):
     helpful_count = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Each sort mode of a product's review list is an index range scan
+    __table_args__ = (
+        Index("ix_reviews_product_newest", "product_id", "is_approved", "created_at", "id"),
+        Index("ix_reviews_product_helpful", "product_id", "is_approved", "helpful_count", "id"),
+        Index("ix_reviews_product_rating", "product_id", "is_approved", "rating", "id"),
+        Index("ix_reviews_moderation_newest", "is_approved", "created_at", "id"),
+    )
+
+class HelpfulVoteBatch(Base):
+    """Helpful-vote batches already applied to review counts; a batch flushed twice is skipped"""
+    __tablename__ = "helpful_vote_batches"
+    batch_id = Column(String(32), primary_key=True)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class ProductRatingStats(Base):
+    """Approved-review counters per product, kept in step with review writes"""
+    __tablename__ = "product_rating_stats"
+    product_id = Column(Integer, primary_key=True)
+    star_1 = Column(Integer, nullable=False, default=0)
+    star_2 = Column(Integer, nullable=False, default=0)
+    star_3 = Column(Integer, nullable=False, default=0)
+    star_4 = Column(Integer, nullable=False, default=0)
+    star_5 = Column(Integer, nullable=False, default=0)
+    total_reviews = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+
 # Schemas
 class ReviewCreate(BaseModel):
     product_id: int
@@ -63,25 +98,180 @@ class ProductRatingSummary(BaseModel):
     total_reviews: int
     rating_breakdown: dict  # {1: count, 2: count, ...}
 
+MAX_SUMMARY_BATCH = 100
+
+# Sort name -> (key column, descending)
+REVIEW_SORTS = {
+    "newest": (Review.created_at, True),
+    "helpful": (Review.helpful_count, True),
+    "rating_desc": (Review.rating, True),
+    "rating_asc": (Review.rating, False),
+}
+REVIEW_SORT_PATTERN = "^(newest|helpful|rating_desc|rating_asc)$"
+
+async def _review_page(db: AsyncSession, query, sort: str, cursor: Optional[str], limit: int, response: Response):
+    """Fetch one keyset page; the cursor for the next page goes in the X-Next-Cursor header"""
+    column, descending = REVIEW_SORTS[sort]
+    try:
+        query = apply_keyset(query, sort, column, Review.id, descending, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await db.execute(query.limit(limit + 1))
+    reviews = result.scalars().all()
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        last = reviews[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(sort, getattr(last, column.key), last.id)
+    return reviews
+
+# Rating stats
+async def _bump_rating_stats(db: AsyncSession, product_id: int, rating: int, delta: int):
+    """Add (delta=1) or remove (delta=-1) one approved review from the product's counters"""
+    star = f"star_{rating}"
+    stmt = pg_insert(ProductRatingStats).values(
+        product_id=product_id, total_reviews=delta, rating_sum=rating * delta, **{star: delta}
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ProductRatingStats.product_id],
+        set_={
+            star: getattr(ProductRatingStats, star) + delta,
+            "total_reviews": ProductRatingStats.total_reviews + delta,
+            "rating_sum": ProductRatingStats.rating_sum + rating * delta,
+        }
+    )
+    await db.execute(stmt)
+
+async def rebuild_rating_stats(db: AsyncSession, only_if_empty: bool = False):
+    """Recompute every product's counters from approved reviews in one GROUP BY pass; with `only_if_empty`,
+    skip it if another rebuild got there first"""
+    # Concurrent rebuilds and review bumps wait on this lock, so none can land between the delete and the insert
+    await db.execute(text("LOCK TABLE product_rating_stats IN EXCLUSIVE MODE"))
+    if only_if_empty and await db.scalar(select(ProductRatingStats.product_id).limit(1)) is not None:
+        await db.rollback()
+        return
+    stars = [func.count(case((Review.rating == i, 1))) for i in range(1, 6)]
+    await db.execute(delete(ProductRatingStats))
+    await db.execute(
+        pg_insert(ProductRatingStats).from_select(
+            ["product_id", "star_1", "star_2", "star_3", "star_4", "star_5", "total_reviews", "rating_sum"],
+            select(Review.product_id, *stars, func.count(), func.sum(Review.rating))
+            .where(Review.is_approved == True)
+            .group_by(Review.product_id)
+        )
+    )
+    await db.commit()
+
+def _summary(product_id: int, stats: Optional[ProductRatingStats]) -> ProductRatingSummary:
+    if not stats or not stats.total_reviews:
+        return ProductRatingSummary(
+            product_id=product_id,
+            average_rating=0,
+            total_reviews=0,
+            rating_breakdown={1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+        )
+    return ProductRatingSummary(
+        product_id=product_id,
+        average_rating=round(stats.rating_sum / stats.total_reviews, 1),
+        total_reviews=stats.total_reviews,
+        rating_breakdown={i: getattr(stats, f"star_{i}") for i in range(1, 6)}
+    )
+
+# Helpful votes: buffered in a Redis hash (review_id -> pending delta) and
+# applied to Postgres in batches, so a viral review never queues on its row lock
+HELPFUL_PENDING_KEY = "reviews:helpful:pending"
+HELPFUL_BATCH_PREFIX = "reviews:helpful:batch:"
+HELPFUL_FLUSH_INTERVAL = float(os.getenv("HELPFUL_FLUSH_INTERVAL", "5"))
+# Applied batch ids only need to outlive the Redis hash they came from
+HELPFUL_BATCH_RETENTION = timedelta(days=1)
+
+async def _apply_helpful_batch(client, key: str) -> int:
+    """Apply one claimed batch at most once; its id is recorded in the same transaction as the counts"""
+    deltas = await client.hgetall(key)
+    applied = False
+    if deltas:
+        async with AsyncSessionLocal() as db:
+            # Concurrent flushes of one batch serialize on this primary key; only the first gets a row back
+            applied = await db.scalar(
+                pg_insert(HelpfulVoteBatch)
+                .values(batch_id=key[len(HELPFUL_BATCH_PREFIX):])
+                .on_conflict_do_nothing()
+                .returning(HelpfulVoteBatch.batch_id)
+            ) is not None
+            if applied:
+                await db.execute(
+                    update(Review.__table__)
+                    .where(Review.__table__.c.id == bindparam("review_id"))
+                    .values(helpful_count=Review.__table__.c.helpful_count + bindparam("delta")),
+                    [{"review_id": int(rid), "delta": int(delta)} for rid, delta in deltas.items()]
+                )
+                await db.execute(delete(HelpfulVoteBatch).where(
+                    HelpfulVoteBatch.applied_at < datetime.now(timezone.utc) - HELPFUL_BATCH_RETENTION
+                ))
+            await db.commit()
+    await client.delete(key)
+    return len(deltas) if applied else 0
+
+async def flush_helpful_votes() -> int:
+    """Apply buffered helpful votes to Postgres; returns the number of reviews updated"""
+    client = AsyncRedisClient.get_client()
+    # RENAME is atomic: exactly one worker takes the pending hash, under a key no other flush uses
+    try:
+        await client.rename(HELPFUL_PENDING_KEY, f"{HELPFUL_BATCH_PREFIX}{uuid.uuid4().hex}")
+    except redis.ResponseError:
+        pass  # nothing pending
+    # Our batch plus any a dead flush left behind; applying one twice is a no-op
+    updated = 0
+    async for key in client.scan_iter(match=f"{HELPFUL_BATCH_PREFIX}*"):
+        updated += await _apply_helpful_batch(client, key)
+    return updated
+
+async def _helpful_flusher():
+    while True:
+        await asyncio.sleep(HELPFUL_FLUSH_INTERVAL)
+        try:
+            await flush_helpful_votes()
+        except Exception as e:
+            print(f"Helpful vote flush error: {e}")
+
+_flusher_task: Optional[asyncio.Task] = None
+
 # Startup
 @app.on_event("startup")
 async def startup_event():
-    init_db()
-    Base.metadata.create_all(bind=engine)
+    global _flusher_task
+    await init_async_db()
+    async with async_engine.begin() as conn:
+        await ensure_indexes(conn, Review.__table__)
+    # Backfill counters for reviews written before the stats table existed
+    async with AsyncSessionLocal() as db:
+        if await db.scalar(select(ProductRatingStats.product_id).limit(1)) is None:
+            await rebuild_rating_stats(db, only_if_empty=True)
+    _flusher_task = asyncio.create_task(_helpful_flusher())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _flusher_task:
+        _flusher_task.cancel()
+    try:
+        await flush_helpful_votes()
+    except Exception as e:
+        print(f"Helpful vote flush error: {e}")
+    await AsyncRedisClient.close()
+    await close_async_db()
 
 # Routes
 @app.post("/", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
 async def create_review(
     review_data: ReviewCreate,
     current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a product review"""
     # One review per user per product
-    existing = db.query(Review).filter(
+    existing = await db.scalar(select(Review).where(
         Review.product_id == review_data.product_id,
         Review.user_id == int(current_user["sub"])
-    ).first()
+    ))
     if existing:
         raise HTTPException(status_code=400, detail="You have already reviewed this product")
 
@@ -94,90 +284,108 @@ async def create_review(
         body=review_data.body,
     )
     db.add(review)
-    db.commit()
-    db.refresh(review)
+    await db.flush()
+    if review.is_approved:
+        await _bump_rating_stats(db, review.product_id, review.rating, 1)
+    await db.commit()
+    await db.refresh(review)
     return review
 
 @app.get("/product/{product_id}", response_model=List[ReviewResponse])
-async def get_product_reviews(product_id: int, db: Session = Depends(get_db)):
-    """Get all reviews for a product"""
-    reviews = db.query(Review).filter(
+async def get_product_reviews(
+    product_id: int,
+    response: Response,
+    sort: str = Query("newest", pattern=REVIEW_SORT_PATTERN),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a page of approved reviews for a product"""
+    query = select(Review).where(
         Review.product_id == product_id,
         Review.is_approved == True
-    ).order_by(Review.created_at.desc()).all()
-    return reviews
+    )
+    return await _review_page(db, query, sort, cursor, limit, response)
 
 @app.get("/product/{product_id}/summary", response_model=ProductRatingSummary)
-async def get_rating_summary(product_id: int, db: Session = Depends(get_db)):
+async def get_rating_summary(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get rating summary for a product"""
-    reviews = db.query(Review).filter(
-        Review.product_id == product_id,
-        Review.is_approved == True
-    ).all()
+    return _summary(product_id, await db.get(ProductRatingStats, product_id))
 
-    if not reviews:
-        return ProductRatingSummary(
-            product_id=product_id,
-            average_rating=0,
-            total_reviews=0,
-            rating_breakdown={1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        )
-
-    breakdown = {i: 0 for i in range(1, 6)}
-    total_rating = 0
-    for r in reviews:
-        breakdown[r.rating] = breakdown.get(r.rating, 0) + 1
-        total_rating += r.rating
-
-    return ProductRatingSummary(
-        product_id=product_id,
-        average_rating=round(total_rating / len(reviews), 1),
-        total_reviews=len(reviews),
-        rating_breakdown=breakdown
-    )
+@app.get("/summaries", response_model=List[ProductRatingSummary])
+async def get_rating_summaries(
+    product_ids: List[int] = Query(..., max_length=MAX_SUMMARY_BATCH),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get rating summaries for many products in one call (e.g. a listing page)"""
+    result = await db.execute(select(ProductRatingStats).where(ProductRatingStats.product_id.in_(product_ids)))
+    found = {stats.product_id: stats for stats in result.scalars().all()}
+    return [_summary(pid, found.get(pid)) for pid in dict.fromkeys(product_ids)]
 
 @app.post("/{review_id}/helpful")
-async def mark_helpful(review_id: int, db: Session = Depends(get_db)):
+async def mark_helpful(review_id: int, db: AsyncSession = Depends(get_async_db)):
     """Mark a review as helpful"""
-    review = db.query(Review).filter(Review.id == review_id).first()
-    if not review:
+    helpful_count = await db.scalar(select(Review.helpful_count).where(Review.id == review_id))
+    if helpful_count is None:
         raise HTTPException(status_code=404, detail="Review not found")
-    review.helpful_count += 1
-    db.commit()
-    return {"helpful_count": review.helpful_count}
+    try:
+        pending = await AsyncRedisClient.get_client().hincrby(HELPFUL_PENDING_KEY, review_id, 1)
+        return {"helpful_count": helpful_count + pending}
+    except redis.RedisError:
+        # Without the buffer, fall back to a single atomic statement
+        helpful_count = await db.scalar(
+            update(Review).where(Review.id == review_id)
+            .values(helpful_count=Review.helpful_count + 1)
+            .returning(Review.helpful_count)
+        )
+        await db.commit()
+        return {"helpful_count": helpful_count}
 
 @app.get("/admin/all", response_model=List[ReviewResponse])
 async def admin_list_reviews(
+    response: Response,
+    status: Optional[str] = Query(None, pattern="^(pending|approved)$"),
+    sort: str = Query("newest", pattern=REVIEW_SORT_PATTERN),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
     current_admin: dict = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Admin: list all reviews"""
-    return db.query(Review).order_by(Review.created_at.desc()).all()
+    """Admin: list reviews a page at a time, optionally by moderation status"""
+    query = select(Review)
+    if status:
+        query = query.where(Review.is_approved == (status == "approved"))
+    return await _review_page(db, query, sort, cursor, limit, response)
 
 @app.put("/admin/{review_id}/approve")
 async def approve_review(
     review_id: int,
     current_admin: dict = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    review = db.query(Review).filter(Review.id == review_id).first()
+    # Row lock: concurrent moderation of one review must count it once
+    review = await db.get(Review, review_id, with_for_update=True)
     if not review:
         raise HTTPException(status_code=404, detail="Not found")
+    if not review.is_approved:
+        await _bump_rating_stats(db, review.product_id, review.rating, 1)
     review.is_approved = True
-    db.commit()
+    await db.commit()
     return {"message": "Approved"}
 
 @app.delete("/admin/{review_id}")
 async def delete_review(
     review_id: int,
     current_admin: dict = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    review = db.query(Review).filter(Review.id == review_id).first()
+    review = await db.get(Review, review_id, with_for_update=True)
     if not review:
         raise HTTPException(status_code=404, detail="Not found")
-    db.delete(review)
-    db.commit()
+    if review.is_approved:
+        await _bump_rating_stats(db, review.product_id, review.rating, -1)
+    await db.delete(review)
+    await db.commit()
     return {"message": "Deleted"}
 
 @app.get("/health")
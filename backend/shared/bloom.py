@@ -0,0 +1,34 @@
+"""Bloom filter for cheap negative lookups against large key sets"""
+import hashlib
+import math
+from typing import Iterable, Iterator
+
+class BloomFilter:
+    """Set-membership test with no false negatives and about `fp_rate` false positives"""
+
+    def __init__(self, capacity: int, fp_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    @classmethod
+    def from_items(cls, items: Iterable[str], capacity: int, fp_rate: float = 0.001) -> "BloomFilter":
+        bloom = cls(capacity, fp_rate)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
@@ -0,0 +1,109 @@
+"""Shared pooled HTTP clients for inter-service calls"""
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from shared.auth_middleware import INTERNAL_SERVICE_TOKEN
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "1.0"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "2.0"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.1"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open"""
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after a cool-down"""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Half-open: the next outcome decides whether to close or re-open
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+class ServiceClient:
+    """Keep-alive connection pool, timeouts, retries and circuit breaker for one target service"""
+
+    def __init__(self, name: str, base_url: str):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"X-Internal-Token": INTERNAL_SERVICE_TOKEN},
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+        )
+
+    async def request(self, method: str, path: str, idempotent: bool = False, **kwargs) -> httpx.Response:
+        """Send a request; only idempotent calls are retried, with jittered exponential backoff"""
+        attempts = 1 + (HTTP_MAX_RETRIES if idempotent else 0)
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                self.breaker.record_failure()
+                if attempt == attempts - 1:
+                    raise
+            else:
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                if attempt == attempts - 1:
+                    return response
+            await asyncio.sleep(random.uniform(0, HTTP_RETRY_BACKOFF * 2 ** attempt))
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, idempotent=True, **kwargs)
+
+    async def post(self, path: str, idempotent: bool = False, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, idempotent=idempotent, **kwargs)
+
+    async def close(self):
+        await self.client.aclose()
+
+_clients: Dict[str, ServiceClient] = {}
+
+def get_service_client(name: str) -> ServiceClient:
+    """Pooled client for `name`, addressed by the <NAME>_SERVICE_URL environment variable"""
+    if name not in _clients:
+        base_url = os.getenv(f"{name.upper()}_SERVICE_URL")
+        if not base_url:
+            raise RuntimeError(f"{name.upper()}_SERVICE_URL is not configured")
+        _clients[name] = ServiceClient(name, base_url)
+    return _clients[name]
+
+async def close_service_clients():
+    """Close every pooled client; call from the service's shutdown hook"""
+    for client in _clients.values():
+        await client.close()
+    _clients.clear()
@@ -0,0 +1,38 @@
+"""Keyset (cursor) pagination helpers shared by list endpoints"""
+from datetime import datetime
+from typing import Any, Optional, Tuple
+import base64
+import json
+
+from sqlalchemy import tuple_
+
+def encode_cursor(sort: str, key: Any, last_id: int) -> str:
+    """Opaque cursor pointing just past the row with (`key`, `last_id`) in `sort` order"""
+    data = {"s": sort, "k": key, "i": last_id}
+    if isinstance(key, datetime):
+        data.update(k=key.isoformat(), t="dt")
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """Return the (sort key, id) pair encoded in `cursor`; raises ValueError if invalid"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        key, last_id = data["k"], int(data["i"])
+        if data.get("t") == "dt":
+            key = datetime.fromisoformat(key)
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Malformed cursor")
+    if data.get("s") != sort:
+        raise ValueError("Cursor was issued for a different sort order")
+    return key, last_id
+
+def apply_keyset(query, sort: str, column, id_column, descending: bool, cursor: Optional[str] = None):
+    """Order `query` by (column, id) and seek past `cursor` instead of using OFFSET"""
+    if cursor:
+        key, last_id = decode_cursor(cursor, sort)
+        position = tuple_(column, id_column)
+        query = query.where(position < (key, last_id) if descending else position > (key, last_id))
+    if descending:
+        return query.order_by(column.desc(), id_column.desc())
+    return query.order_by(column.asc(), id_column.asc())
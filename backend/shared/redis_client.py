@@ -1,9 +1,14 @@
 """Shared Redis client configuration"""
 import os
 import redis
+import redis.asyncio as aioredis
 from typing import Optional
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+# Seconds a command waits for a free pooled connection before raising
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
 
 class RedisClient:
     _instance: Optional[redis.Redis] = None
@@ -30,3 +35,47 @@ class RedisClient:
 def get_redis() -> redis.Redis:
     """Dependency for getting Redis client"""
     return RedisClient.get_client()
+
+class AsyncRedisClient:
+    _pool: Optional[aioredis.ConnectionPool] = None
+    _instance: Optional[aioredis.Redis] = None
+
+    @classmethod
+    def get_client(cls) -> aioredis.Redis:
+        """Get asyncio Redis client singleton backed by a bounded connection pool.
+
+        Bursts beyond REDIS_MAX_CONNECTIONS queue for a free connection instead of failing.
+        """
+        if cls._instance is None:
+            cls._pool = aioredis.BlockingConnectionPool.from_url(
+                REDIS_URL,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                timeout=REDIS_POOL_TIMEOUT,
+                decode_responses=True,
+                socket_connect_timeout=5,
+                socket_timeout=5,
+                health_check_interval=REDIS_HEALTH_CHECK_INTERVAL
+            )
+            cls._instance = aioredis.Redis(connection_pool=cls._pool)
+        return cls._instance
+
+    @classmethod
+    async def ping(cls) -> bool:
+        """Check Redis reachability for health endpoints"""
+        try:
+            return await cls.get_client().ping()
+        except redis.RedisError:
+            return False
+
+    @classmethod
+    async def close(cls):
+        """Close the client and disconnect every pooled connection"""
+        if cls._instance:
+            await cls._instance.aclose()
+            await cls._pool.disconnect()
+            cls._instance = None
+            cls._pool = None
+
+async def get_async_redis() -> aioredis.Redis:
+    """Dependency for getting asyncio Redis client"""
+    return AsyncRedisClient.get_client()
@@ -0,0 +1,133 @@
+"""Per-request SQL instrumentation: Server-Timing headers, Prometheus metrics and a slow-query log"""
+import heapq
+import os
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from shared.database import async_engine, engine
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SQL_SLOWEST_KEPT = int(os.getenv("SQL_SLOWEST_KEPT", "3"))
+# Statement text in response headers helps local debugging but leaks schema details
+SQL_TIMING_DETAIL = os.getenv("SQL_TIMING_DETAIL", "false").lower() == "true"
+
+STATEMENT_SECONDS = Histogram(
+    "db_statement_duration_seconds", "Duration of individual SQL statements",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+REQUEST_STATEMENTS = Histogram(
+    "db_statements_per_request", "SQL statements issued while serving a request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+)
+REQUEST_DB_SECONDS = Histogram(
+    "db_time_per_request_seconds", "Total SQL time spent serving a request", ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+SLOW_STATEMENTS = Counter("db_slow_statements_total", "Statements slower than SLOW_QUERY_MS", ["route"])
+
+def _route_label(scope: Optional[dict]) -> str:
+    # Route templates keep label cardinality bounded; raw paths would not
+    if scope is None:
+        return "-"
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+class RequestStats:
+    """SQL statement count, total time and slowest statements for one request"""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest: List[Tuple[float, str]] = []  # min-heap of the SQL_SLOWEST_KEPT slowest
+
+    def record(self, seconds: float, statement: str):
+        self.count += 1
+        self.seconds += seconds
+        if len(self.slowest) < SQL_SLOWEST_KEPT:
+            heapq.heappush(self.slowest, (seconds, statement))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, statement))
+
+    def server_timing(self) -> str:
+        entries = [f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"']
+        if SQL_TIMING_DETAIL:
+            for rank, (seconds, statement) in enumerate(sorted(self.slowest, reverse=True), 1):
+                desc = " ".join(statement.split())[:80].replace('"', "'").replace("\\", "")
+                entries.append(f'db-slow-{rank};dur={seconds * 1000:.1f};desc="{desc}"')
+        return ", ".join(entries)
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("sql_request_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    """Stats for the request being served, or None outside a request (startup, workers, CLI)"""
+    return _current.get()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_metrics_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["sql_metrics_start"].pop()
+    STATEMENT_SECONDS.observe(seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.record(seconds, statement)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        scope = stats.scope if stats else None
+        method = scope.get("method", "") if scope else ""
+        route = _route_label(scope)
+        SLOW_STATEMENTS.labels(route=route).inc()
+        print(f"Slow query ({seconds * 1000:.1f} ms) on {method} {route}: {' '.join(statement.split())[:1000]}")
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    starts = exception_context.connection.info.get("sql_metrics_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+for _target in (engine, async_engine.sync_engine):
+    event.listen(_target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(_target, "handle_error", _handle_error)
+
+class SQLMetricsMiddleware:
+    """ASGI middleware collecting SQL stats per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+
+        async def send_with_timing(message):
+            # Statements run after the headers go out (streamed bodies) still reach the metrics
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", stats.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = _route_label(scope)
+            REQUEST_STATEMENTS.labels(route=route).observe(stats.count)
+            REQUEST_DB_SECONDS.labels(route=route).observe(stats.seconds)
+
+def instrument_app(app: FastAPI):
+    """Add SQL metrics to every request and expose them on GET /metrics"""
+    app.add_middleware(SQLMetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
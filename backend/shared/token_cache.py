@@ -0,0 +1,112 @@
+"""In-process cache of verified JWT payloads, with optional Redis-backed revocation"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import redis
+
+from shared.redis_client import AsyncRedisClient
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_REVOCATION_ENABLED = os.getenv("TOKEN_REVOCATION_ENABLED", "false").lower() == "true"
+
+REVOKED_KEY_PREFIX = "auth:revoked:"
+REVOCATION_CHANNEL = "auth:revocations"
+
+def token_hash(token: str) -> str:
+    """Cache key for a raw token; the token itself is never kept in memory or Redis"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class TokenCache:
+    """Bounded LRU of decoded payloads, each valid until its own `exp` claim"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[0])
+
+    def put(self, key: str, payload: dict):
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            return  # Tokens without an expiry are verified every time
+        self._entries[key] = (dict(payload), exp)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+_listener: Optional[asyncio.Task] = None
+
+async def _listen_for_revocations():
+    """Evict revoked tokens from this process's cache as soon as any service revokes them"""
+    while True:
+        pubsub = AsyncRedisClient.get_client().pubsub()
+        try:
+            await pubsub.subscribe(REVOCATION_CHANNEL)
+            # Revocations published while we were not subscribed may still be cached
+            token_cache.clear()
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message:
+                    token_cache.discard(message["data"])
+        except redis.RedisError as e:
+            print(f"Token revocation listener error: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+def _ensure_listener():
+    global _listener
+    if _listener is None or _listener.done():
+        _listener = asyncio.create_task(_listen_for_revocations())
+
+async def is_revoked(key: str) -> bool:
+    """Check the shared revocation list; only consulted on a cache miss"""
+    if not TOKEN_REVOCATION_ENABLED:
+        return False
+    _ensure_listener()
+    try:
+        return bool(await AsyncRedisClient.get_client().exists(REVOKED_KEY_PREFIX + key))
+    except redis.RedisError as e:
+        print(f"Token revocation check error: {e}")
+        return False
+
+async def revoke(token: str, exp: Optional[float]):
+    """Reject `token` everywhere until it would have expired anyway"""
+    key = token_hash(token)
+    token_cache.discard(key)
+    if not TOKEN_REVOCATION_ENABLED or exp is None:
+        return
+    ttl = int(exp - time.time()) + 1
+    if ttl <= 0:
+        return
+    try:
+        client = AsyncRedisClient.get_client()
+        await client.set(REVOKED_KEY_PREFIX + key, 1, ex=ttl)
+        await client.publish(REVOCATION_CHANNEL, key)
+    except redis.RedisError as e:
+        print(f"Token revocation error: {e}")
@@ -0,0 +1,41 @@
+"""Bulk import only overwrites the fields a row provides"""
+from sqlalchemy import select
+
+from product_service import models
+from product_service.bulk import run_import
+
+async def _body(text: str):
+    yield text.encode()
+
+async def _seed(db) -> models.Product:
+    category = models.Category(name="Mugs", slug="mugs")
+    product = models.Product(
+        name="Mug", slug="mug", price=10, stock_quantity=7, sku="MUG-1", barcode="0001", category=category
+    )
+    db.add(product)
+    await db.commit()
+    return product
+
+async def _reload(db, slug: str) -> models.Product:
+    return await db.scalar(select(models.Product).where(models.Product.slug == slug).execution_options(populate_existing=True))
+
+async def test_csv_updates_only_its_columns(db):
+    product = await _seed(db)
+
+    report = await run_import(db, _body("slug,name,price,sku\nmug,Big mug,12.5,\nplate,Plate,4,PLATE-1\n"), "csv")
+
+    assert (report.created, report.updated, report.failed) == (1, 1, 0)
+    mug = await _reload(db, "mug")
+    assert (mug.name, mug.price) == ("Big mug", 12.5)
+    # Absent columns and empty cells keep what was stored
+    assert (mug.stock_quantity, mug.sku, mug.barcode, mug.category_id) == (7, "MUG-1", "0001", product.category_id)
+    plate = await _reload(db, "plate")
+    assert (plate.stock_quantity, plate.sku, plate.low_stock_threshold) == (0, "PLATE-1", 10)
+
+async def test_ndjson_updates_only_its_keys(db):
+    await _seed(db)
+
+    await run_import(db, _body('{"slug": "mug", "name": "Mug", "price": 10, "stock_quantity": 3}\n'), "ndjson")
+
+    mug = await _reload(db, "mug")
+    assert (mug.stock_quantity, mug.sku, mug.barcode) == (3, "MUG-1", "0001")
@@ -0,0 +1,104 @@
+"""Checkout against in-process product and coupon services"""
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import func, select, text
+
+from coupon_service.main import Coupon, CouponCode, CouponRedemption, DiscountType, coupon_index
+from coupon_service.main import app as coupon_app
+from order_service import main as orders
+from order_service.main import Order, OrderDailyStat, OrderStatus
+from order_service.outbox import drain_once
+from product_service import models
+from product_service.main import app as product_app
+from product_service.reservations import release_expired
+from shared.auth_middleware import create_access_token
+
+ORDER = {"shipping_address": "1 Main St", "phone": "555-0100"}
+CUSTOMER = {"Authorization": f"Bearer {create_access_token({'sub': '5', 'email': 'buyer@example.com'})}"}
+
+@pytest.fixture
+async def client(services):
+    services("product", product_app)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=orders.app), base_url="http://test") as client:
+        yield client
+
+async def _product(db, stock: int) -> models.Product:
+    product = models.Product(name="Last unit", slug="last-unit", price=10, stock_quantity=stock)
+    db.add(product)
+    await db.commit()
+    return product
+
+async def _checkout(client, product: models.Product, headers: dict = CUSTOMER, **extra) -> httpx.Response:
+    items = [{"product_id": product.id, "product_name": product.name, "quantity": 1, "price": 10}]
+    return await client.post("/", json={**ORDER, "items": items, **extra}, headers=headers)
+
+async def test_no_transaction_is_open_while_stock_is_reserved(db, client, monkeypatch):
+    product = await _product(db, 1)
+    reserve, idle = orders._reserve_stock, []
+
+    async def observed(order_id, items):
+        idle.append(await db.scalar(text(
+            "SELECT count(*) FROM pg_stat_activity WHERE state = 'idle in transaction' AND pid <> pg_backend_pid()"
+        )))
+        await db.rollback()
+        await reserve(order_id, items)
+    monkeypatch.setattr(orders, "_reserve_stock", observed)
+
+    response = await _checkout(client, product)
+
+    assert response.status_code == 201
+    assert idle == [0]
+    assert await db.scalar(select(models.StockReservation.order_ref)) == f"order-{response.json()['id']}"
+
+async def test_order_whose_stock_sold_out_is_cancelled(db, client):
+    product = await _product(db, 1)
+    order_id = (await _checkout(client, product)).json()["id"]
+    # The hold lapses before the outbox commits it, and someone else buys the unit
+    reservation = await db.scalar(select(models.StockReservation))
+    reservation.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await db.commit()
+    assert await release_expired() == 1
+    assert (await _checkout(client, product)).status_code == 201
+
+    await drain_once()
+
+    db.expire_all()
+    assert (await db.get(Order, order_id)).status == OrderStatus.CANCELLED
+    counts = dict((await db.execute(select(OrderDailyStat.status, OrderDailyStat.order_count))).all())
+    assert counts == {OrderStatus.PENDING: 1, OrderStatus.CANCELLED: 1}
+
+async def test_cancelled_order_cannot_be_reopened(db, client, admin_headers):
+    product = await _product(db, 1)
+    order_id = (await _checkout(client, product)).json()["id"]
+    cancel = await client.put(f"/{order_id}/status", params={"status": "cancelled"}, headers=admin_headers)
+    assert cancel.status_code == 200
+
+    response = await client.put(f"/{order_id}/status", params={"status": "processing"}, headers=admin_headers)
+
+    assert response.status_code == 400
+    db.expire_all()
+    assert (await db.get(Order, order_id)).status == OrderStatus.CANCELLED
+
+async def test_single_use_code_is_redeemed_by_one_order(db, client, services):
+    services("coupon", coupon_app)
+    product = await _product(db, 2)
+    template = Coupon(code="LAST1", discount_type=DiscountType.FIXED, discount_value=5, is_template=True)
+    db.add(template)
+    await db.flush()
+    db.add(CouponCode(code="LAST1-ABCDEFGHJK", coupon_id=template.id))
+    await db.commit()
+    await coupon_index.reload()
+
+    # A guest checkout, so no customer token reaches the coupon service
+    first = await _checkout(client, product, headers={}, coupon_code="last1-abcdefghjk")
+    assert first.status_code == 201
+    assert first.json()["total"] == 11.49  # (10 - 5) + 10% tax + shipping
+    await drain_once()
+
+    redemption = await db.scalar(select(CouponRedemption))
+    assert (redemption.order_ref, redemption.status) == (f"order-{first.json()['id']}", "committed")
+    second = await _checkout(client, product, headers={}, coupon_code="last1-abcdefghjk")
+    assert second.status_code == 400
+    assert await db.scalar(select(func.count()).select_from(Order)) == 1
@@ -0,0 +1,79 @@
+"""Coupon uses are claimed atomically at checkout"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from coupon_service.main import Coupon, CouponCode, CouponRedemption, DiscountType, app, release_expired_claims
+from shared.auth_middleware import INTERNAL_SERVICE_TOKEN
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"X-Internal-Token": INTERNAL_SERVICE_TOKEN}
+    ) as client:
+        yield client
+
+async def _coupon(db, usage_limit=None, is_template=False) -> Coupon:
+    coupon = Coupon(
+        code="LAST1", discount_type=DiscountType.FIXED, discount_value=5, usage_limit=usage_limit, is_template=is_template
+    )
+    db.add(coupon)
+    await db.commit()
+    return coupon
+
+async def _usage(db, coupon: Coupon) -> int:
+    return await db.scalar(select(Coupon.usage_count).where(Coupon.id == coupon.id))
+
+async def _claim(client, order_ref: str, code: str = "last1") -> httpx.Response:
+    return await client.post("/redemptions", json={"order_ref": order_ref, "code": code})
+
+async def test_last_use_goes_to_one_checkout(db, client):
+    coupon = await _coupon(db, usage_limit=1)
+
+    responses = await asyncio.gather(*(_claim(client, f"order-{n}") for n in range(20)))
+
+    assert sorted(r.status_code for r in responses) == [201] + [409] * 19
+    assert await _usage(db, coupon) == 1
+
+async def test_claim_is_idempotent_per_order(db, client):
+    coupon = await _coupon(db, usage_limit=5)
+
+    assert (await _claim(client, "order-1")).status_code == 201
+    assert (await _claim(client, "order-1")).status_code == 201
+    assert await _usage(db, coupon) == 1
+
+async def test_release_gives_the_use_back(db, client):
+    coupon = await _coupon(db, usage_limit=1)
+    await _claim(client, "order-1")
+    await client.post("/redemptions/order-1/commit")
+
+    assert (await client.post("/redemptions/order-1/release")).json()["status"] == "released"
+    assert await _usage(db, coupon) == 0
+    assert (await _claim(client, "order-2")).status_code == 201
+    assert (await client.post("/redemptions/order-1/commit")).status_code == 409
+
+async def test_generated_code_is_burned_and_restored(db, client):
+    template = await _coupon(db, is_template=True)
+    db.add(CouponCode(code="LAST1-ABCDEFGHJK", coupon_id=template.id))
+    await db.commit()
+
+    assert (await _claim(client, "order-1", "last1-abcdefghjk")).status_code == 201
+    assert (await _claim(client, "order-2", "last1-abcdefghjk")).status_code == 409
+    await client.post("/redemptions/order-1/release")
+    assert (await _claim(client, "order-3", "last1-abcdefghjk")).status_code == 201
+
+async def test_unconfirmed_claim_expires(db, client):
+    coupon = await _coupon(db, usage_limit=1)
+    await _claim(client, "order-1")
+    redemption = await db.scalar(select(CouponRedemption))
+    redemption.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await db.commit()
+
+    assert await release_expired_claims() == 1
+    assert await _usage(db, coupon) == 0
+    # A late confirmation takes the use again while one is left
+    assert (await client.post("/redemptions/order-1/commit")).json()["status"] == "committed"
+    assert await _usage(db, coupon) == 1
@@ -0,0 +1,63 @@
+"""Buffered helpful votes are applied exactly once"""
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import select
+
+from review_service.main import (
+    HELPFUL_BATCH_PREFIX,
+    HELPFUL_PENDING_KEY,
+    HelpfulVoteBatch,
+    Review,
+    flush_helpful_votes,
+)
+from shared.redis_client import AsyncRedisClient
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_REDIS_URL"), reason="TEST_REDIS_URL is not set")
+
+@pytest.fixture
+async def redis_client():
+    client = AsyncRedisClient.get_client()
+    await client.delete(HELPFUL_PENDING_KEY, *[key async for key in client.scan_iter(match=f"{HELPFUL_BATCH_PREFIX}*")])
+    yield client
+    await AsyncRedisClient.close()
+
+async def _review(db) -> Review:
+    review = Review(product_id=1, user_id=1, user_name="A", rating=5)
+    db.add(review)
+    await db.commit()
+    return review
+
+async def _helpful_count(db, review: Review) -> int:
+    return await db.scalar(select(Review.helpful_count).where(Review.id == review.id).execution_options(populate_existing=True))
+
+async def test_concurrent_flushes_apply_votes_once(db, redis_client):
+    review = await _review(db)
+    await redis_client.hincrby(HELPFUL_PENDING_KEY, review.id, 7)
+
+    await asyncio.gather(*(flush_helpful_votes() for _ in range(5)))
+
+    assert await _helpful_count(db, review) == 7
+    assert [key async for key in redis_client.scan_iter(match=f"{HELPFUL_BATCH_PREFIX}*")] == []
+
+async def test_batch_left_after_commit_is_not_reapplied(db, redis_client):
+    review = await _review(db)
+    # A flush that committed batch "dead" and then crashed before deleting its hash
+    await redis_client.hset(f"{HELPFUL_BATCH_PREFIX}dead", review.id, 3)
+    db.add(HelpfulVoteBatch(batch_id="dead"))
+    await db.execute(Review.__table__.update().values(helpful_count=3))
+    await db.commit()
+
+    await flush_helpful_votes()
+
+    assert await _helpful_count(db, review) == 3
+    assert not await redis_client.exists(f"{HELPFUL_BATCH_PREFIX}dead")
+
+async def test_batch_left_before_commit_is_recovered(db, redis_client):
+    review = await _review(db)
+    await redis_client.hset(f"{HELPFUL_BATCH_PREFIX}orphan", review.id, 2)
+    await redis_client.hincrby(HELPFUL_PENDING_KEY, review.id, 1)
+
+    assert await flush_helpful_votes() == 2
+    assert await _helpful_count(db, review) == 3
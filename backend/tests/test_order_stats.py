@@ -0,0 +1,50 @@
+"""Order status counters under concurrent admin updates and rebuilds"""
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy import func, select
+
+from order_service.main import Order, OrderDailyStat, OrderStatus, _bump_order_stats, app, rebuild_order_stats
+from shared.database import AsyncSessionLocal
+
+async def test_concurrent_status_updates_keep_counters_consistent(db, admin_headers):
+    order = Order(order_number="ORD-TEST", subtotal=40, total=40, shipping_address="1 Main St", status=OrderStatus.PENDING)
+    db.add(order)
+    await db.flush()
+    await _bump_order_stats(db, datetime.now(timezone.utc).date(), OrderStatus.PENDING, 1, 40)
+    await db.commit()
+
+    targets = [OrderStatus.PROCESSING, OrderStatus.SHIPPED, OrderStatus.DELIVERED, OrderStatus.CANCELLED] * 5
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.put(f"/{order.id}/status", params={"status": target.value}, headers=admin_headers)
+            for target in targets
+        ))
+    await db.refresh(order)
+    # Updates that land after the cancellation are refused; cancelled orders stay cancelled
+    codes = [r.status_code for r in responses]
+    assert set(codes) <= {200, 400}
+    assert order.status == OrderStatus.CANCELLED or 400 not in codes
+
+    rows = (await db.execute(select(OrderDailyStat.status, OrderDailyStat.order_count))).all()
+    counts = {row_status: count for row_status, count in rows}
+    assert sum(counts.values()) == 1
+    assert counts[order.status] == 1
+    assert await db.scalar(select(func.min(OrderDailyStat.order_count))) >= 0
+
+async def test_concurrent_rebuilds_leave_one_row_per_status(db):
+    db.add_all([
+        Order(order_number=f"ORD-{n}", subtotal=10, total=10, shipping_address="1 Main St", status=OrderStatus.DELIVERED)
+        for n in range(3)
+    ])
+    await db.commit()
+
+    async def rebuild(only_if_empty: bool):
+        async with AsyncSessionLocal() as session:
+            await rebuild_order_stats(session, only_if_empty)
+
+    await asyncio.gather(*(rebuild(n % 2 == 0) for n in range(10)))
+
+    rows = (await db.execute(select(OrderDailyStat.status, OrderDailyStat.order_count, OrderDailyStat.revenue))).all()
+    assert rows == [(OrderStatus.DELIVERED, 3, 30)]
@@ -0,0 +1,42 @@
+"""Read-through cache vs. invalidations that land mid-rebuild"""
+import os
+
+import pytest
+
+from product_service import cache
+from shared.redis_client import AsyncRedisClient
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_REDIS_URL"), reason="TEST_REDIS_URL is not set")
+
+KEY = cache.product_key(424242)
+
+@pytest.fixture
+async def redis_client():
+    client = AsyncRedisClient.get_client()
+    await client.delete(KEY, f"version:{KEY}")
+    yield client
+    await client.delete(KEY, f"version:{KEY}")
+    await AsyncRedisClient.close()
+
+async def test_miss_is_cached(redis_client):
+    async def load():
+        return {"name": "fresh"}
+
+    assert await cache.cached(KEY, 60, load) == {"name": "fresh"}
+    assert await redis_client.get(KEY) == '{"name": "fresh"}'
+
+async def test_rebuild_racing_a_write_is_not_stored(redis_client):
+    async def load():
+        # Read the row, then a write commits and invalidates before we store it
+        stale = {"name": "before write"}
+        await cache.invalidate(KEY)
+        return stale
+
+    assert await cache.cached(KEY, 60, load) == {"name": "before write"}
+    assert await redis_client.get(KEY) is None
+
+    async def reload():
+        return {"name": "after write"}
+
+    assert await cache.cached(KEY, 60, reload) == {"name": "after write"}
+    assert await redis_client.get(KEY) == '{"name": "after write"}'
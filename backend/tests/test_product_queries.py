@@ -0,0 +1,85 @@
+"""Statement budget of product listing pages"""
+import httpx
+import pytest
+from sqlalchemy import text
+
+from product_service import models
+from product_service.main import app
+
+async def seed_catalog(db, count: int):
+    """`count` products, each with a category, two images and two variants with attribute options"""
+    category = models.Category(name="Shoes", slug="shoes")
+    size = models.Attribute(name="Size", options=[models.AttributeOption(value=v) for v in ("S", "M", "L")])
+    db.add_all([category, size])
+    await db.flush()
+    for i in range(count):
+        db.add(models.Product(
+            name=f"Product {i}",
+            slug=f"product-{i}",
+            sku=f"SKU-{i}",
+            price=10 + i,
+            stock_quantity=5,
+            category=category,
+            images=[models.ProductImage(image_url=f"/img/{i}-{n}.jpg", sort_order=n) for n in range(2)],
+            variants=[
+                models.ProductVariant(
+                    sku=f"SKU-{i}-{option.value}",
+                    attributes=[models.ProductVariantAttribute(option=option)]
+                )
+                for option in size.options[:2]
+            ]
+        ))
+    await db.commit()
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+async def _page_statements(client, statements, **params) -> int:
+    statements.clear()
+    response = await client.get("/", params={"total": "none", **params})
+    assert response.status_code == 200
+    assert len(response.json()["products"]) == params["page_size"]
+    return len(statements)
+
+async def test_page_statement_count_does_not_grow_with_page_size(db, client, statements):
+    await seed_catalog(db, 100)
+
+    small = await _page_statements(client, statements, page_size=1)
+    large = await _page_statements(client, statements, page_size=100)
+
+    assert small == large
+    # products (+ category), images, variants, variant attributes (+ option)
+    assert large == 4
+
+async def test_exact_total_costs_one_extra_statement(db, client, statements):
+    await seed_catalog(db, 30)
+
+    without_total = await _page_statements(client, statements, page_size=25)
+    statements.clear()
+    response = await client.get("/", params={"page_size": 25, "total": "exact"})
+
+    assert response.json()["total"] == 30
+    assert len(statements) == without_total + 1
+
+async def test_estimated_total_follows_planner_rows(db, client):
+    await seed_catalog(db, 30)
+    await db.execute(text("ANALYZE products"))
+    await db.commit()
+
+    response = await client.get("/", params={"page_size": 10, "total": "estimate"})
+
+    body = response.json()
+    assert body["total"] == 30
+    assert body["total_pages"] == 3
+
+async def test_estimated_total_with_search(db, client):
+    await seed_catalog(db, 30)
+    await db.execute(text("ANALYZE products"))
+    await db.commit()
+
+    response = await client.get("/", params={"search": "product", "page_size": 10, "total": "estimate"})
+
+    assert response.status_code == 200
+    assert response.json()["total"] >= 1
@@ -0,0 +1,19 @@
+"""Async Redis pool behaviour under bursts"""
+import asyncio
+import os
+
+import pytest
+
+from shared import redis_client
+from shared.redis_client import AsyncRedisClient
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_REDIS_URL"), reason="TEST_REDIS_URL is not set")
+
+async def test_burst_beyond_pool_size_waits_for_connections(monkeypatch):
+    monkeypatch.setattr(redis_client, "REDIS_MAX_CONNECTIONS", 5)
+    client = AsyncRedisClient.get_client()
+    try:
+        replies = await asyncio.gather(*(client.execute_command("DEBUG", "SLEEP", "0.01") for _ in range(100)))
+        assert len(replies) == 100
+    finally:
+        await AsyncRedisClient.close()
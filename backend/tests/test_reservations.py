@@ -0,0 +1,74 @@
+"""Stock reservations under contention and after expiry"""
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from product_service import models
+from product_service.main import app
+from product_service.reservation_benchmark import buy_concurrently
+from product_service.reservations import release_expired
+from shared.auth_middleware import INTERNAL_SERVICE_TOKEN
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"X-Internal-Token": INTERNAL_SERVICE_TOKEN}
+    ) as client:
+        yield client
+
+async def _product(db, stock: int) -> models.Product:
+    product = models.Product(name="Last units", slug="last-units", price=10, stock_quantity=stock)
+    db.add(product)
+    await db.commit()
+    return product
+
+async def _stock(db, product: models.Product) -> int:
+    return await db.scalar(select(models.Product.stock_quantity).where(models.Product.id == product.id))
+
+async def test_thousand_buyers_never_oversell_one_sku(db, client):
+    product = await _product(db, 100)
+
+    codes, _ = await buy_concurrently(client, product.id, 1000, "order")
+
+    assert codes.count(201) == 100
+    assert codes.count(409) == 900
+    assert await _stock(db, product) == 0
+
+async def _expire(db, client, product) -> None:
+    response = await client.post("/reservations", json={"order_ref": "order-1", "items": [{"product_id": product.id, "quantity": 2}]})
+    assert response.status_code == 201
+    reservation = await db.scalar(select(models.StockReservation))
+    reservation.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await db.commit()
+    assert await release_expired() == 1
+
+async def test_commit_after_expiry_takes_stock_again(db, client):
+    product = await _product(db, 5)
+    await _expire(db, client, product)
+    assert await _stock(db, product) == 5
+
+    response = await client.post("/reservations/order-1/commit")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "committed"
+    assert await _stock(db, product) == 3
+
+async def test_commit_after_expiry_fails_when_stock_was_sold(db, client):
+    product = await _product(db, 2)
+    await _expire(db, client, product)
+    await client.post("/reservations", json={"order_ref": "order-2", "items": [{"product_id": product.id, "quantity": 1}]})
+
+    response = await client.post("/reservations/order-1/commit")
+
+    assert response.status_code == 409
+    assert await _stock(db, product) == 1
+
+async def test_commit_after_release_is_rejected(db, client):
+    product = await _product(db, 5)
+    await _expire(db, client, product)
+    await client.post("/reservations/order-1/release")
+
+    assert (await client.post("/reservations/order-1/commit")).status_code == 409
+    assert await _stock(db, product) == 5
@@ -0,0 +1,59 @@
+"""Rating counters under concurrent moderation and rebuilds"""
+import asyncio
+
+import httpx
+import pytest
+
+from review_service.main import ProductRatingStats, Review, _bump_rating_stats, app, rebuild_rating_stats
+from shared.database import AsyncSessionLocal
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+async def _stats(db, product_id: int) -> ProductRatingStats:
+    db.expire_all()
+    return await db.get(ProductRatingStats, product_id)
+
+async def test_concurrent_approvals_count_a_review_once(db, client, admin_headers):
+    review = Review(product_id=7, user_id=1, user_name="A", rating=4, is_approved=False)
+    db.add(review)
+    await db.commit()
+
+    responses = await asyncio.gather(*(
+        client.put(f"/admin/{review.id}/approve", headers=admin_headers) for _ in range(20)
+    ))
+
+    assert all(r.status_code == 200 for r in responses)
+    stats = await _stats(db, 7)
+    assert (stats.total_reviews, stats.star_4, stats.rating_sum) == (1, 1, 4)
+
+async def test_concurrent_deletes_remove_a_review_once(db, client, admin_headers):
+    reviews = [Review(product_id=8, user_id=i, user_name="A", rating=5) for i in range(2)]
+    db.add_all(reviews)
+    await db.flush()
+    for review in reviews:
+        await _bump_rating_stats(db, 8, 5, 1)
+    await db.commit()
+
+    responses = await asyncio.gather(*(
+        client.delete(f"/admin/{reviews[0].id}", headers=admin_headers) for _ in range(20)
+    ))
+
+    assert sorted(r.status_code for r in responses) == [200] + [404] * 19
+    stats = await _stats(db, 8)
+    assert (stats.total_reviews, stats.star_5, stats.rating_sum) == (1, 1, 5)
+
+async def test_concurrent_rebuilds_count_each_review_once(db):
+    db.add_all([Review(product_id=9, user_id=i, user_name="A", rating=3, is_approved=True) for i in range(3)])
+    await db.commit()
+
+    async def rebuild(only_if_empty: bool):
+        async with AsyncSessionLocal() as session:
+            await rebuild_rating_stats(session, only_if_empty)
+
+    await asyncio.gather(*(rebuild(n % 2 == 0) for n in range(10)))
+
+    stats = await _stats(db, 9)
+    assert (stats.total_reviews, stats.star_3, stats.rating_sum) == (3, 3, 9)
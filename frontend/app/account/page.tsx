@@ -36,7 +36,7 @@ function AccountContent() {
                 api.getOrders(token!),
                 api.getAddresses(token!)
             ]);
-            setOrders(Array.isArray(ordersData) ? ordersData : []);
+            setOrders(Array.isArray(ordersData.orders) ? ordersData.orders : []);
             setAddresses(Array.isArray(addressesData) ? addressesData : []);
         } catch (err) { }
     };
@@ -154,7 +154,7 @@ function AccountContent() {
                             <div key={o.id} style={{ backgroundColor: 'white', borderRadius: '16px', padding: '20px 24px', border: '1px solid #e5e7eb', display: 'flex', justifyContent: 'space-between', alignItems: 'center', flexWrap: 'wrap', gap: '12px' }}>
                                 <div>
                                     <div style={{ fontWeight: '800', color: '#111827' }}>{o.order_number}</div>
-                                    <div style={{ fontSize: '0.85rem', color: '#6b7280', marginTop: '2px' }}>{new Date(o.created_at).toLocaleDateString('en-GB', { day: 'numeric', month: 'short', year: 'numeric' })} · {o.items?.length} items</div>
+                                    <div style={{ fontSize: '0.85rem', color: '#6b7280', marginTop: '2px' }}>{new Date(o.created_at).toLocaleDateString('en-GB', { day: 'numeric', month: 'short', year: 'numeric' })} · {o.item_count} items</div>
                                 </div>
                                 <div style={{ display: 'flex', alignItems: 'center', gap: '16px' }}>
                                     <span style={{ fontWeight: '800', color: '#111827' }}>${o.total.toFixed(2)}</span>
@@ -22,15 +22,46 @@ function OrdersContent() {
     const [orders, setOrders] = useState<any[]>([]);
     const [loading, setLoading] = useState(true);
     const [expanded, setExpanded] = useState<number | null>(null);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     useEffect(() => {
         if (!token) { router.push('/login'); return; }
-        api.getOrders(token).then(data => {
-            setOrders(Array.isArray(data) ? data : []);
+        api.getOrders(token).then(page => {
+            setOrders(Array.isArray(page.orders) ? page.orders : []);
+            setNextCursor(page.nextCursor);
             setLoading(false);
         }).catch(() => setLoading(false));
     }, [token]);
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const page = await api.getOrders(token!, nextCursor);
+            setOrders(prev => [...prev, ...page.orders]);
+            setNextCursor(page.nextCursor);
+        } catch (e) {
+            console.error(e);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    const toggle = async (order: any) => {
+        if (expanded === order.id) { setExpanded(null); return; }
+        setExpanded(order.id);
+        // The list only carries summaries; line items are loaded on first expand
+        if (!order.items) {
+            try {
+                const detail = await api.getOrder(token!, order.id);
+                setOrders(prev => prev.map(o => o.id === order.id ? { ...o, items: detail.items } : o));
+            } catch (e) {
+                console.error(e);
+            }
+        }
+    };
+
     const steps = ['pending', 'processing', 'shipped', 'delivered'];
 
     return (
@@ -60,7 +91,7 @@ function OrdersContent() {
                                 <div key={order.id} style={{ backgroundColor: 'white', borderRadius: '20px', border: '1px solid #e5e7eb', overflow: 'hidden' }}>
                                     {/* Header */}
                                     <div
-                                        onClick={() => setExpanded(isOpen ? null : order.id)}
+                                        onClick={() => toggle(order)}
                                         style={{ padding: '24px 28px', display: 'flex', justifyContent: 'space-between', alignItems: 'center', cursor: 'pointer' }}
                                     >
                                         <div style={{ display: 'flex', alignItems: 'center', gap: '20px', flexWrap: 'wrap' }}>
@@ -131,6 +162,17 @@ function OrdersContent() {
                                 </div>
                             );
                         })}
+                        {nextCursor && (
+                            <div style={{ textAlign: 'center', marginTop: '8px' }}>
+                                <button
+                                    onClick={loadMore}
+                                    disabled={loadingMore}
+                                    style={{ padding: '12px 28px', backgroundColor: 'white', color: '#111827', border: '1px solid #e5e7eb', borderRadius: '14px', fontWeight: '700', cursor: 'pointer', opacity: loadingMore ? 0.7 : 1 }}
+                                >
+                                    {loadingMore ? 'Loading...' : 'Load older orders'}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 )}
             </div>
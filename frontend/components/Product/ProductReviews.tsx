@@ -26,6 +26,8 @@ export default function ProductReviews({ productId }: { productId: number }) {
     const [reviews, setReviews] = useState<Review[]>([]);
     const [summary, setSummary] = useState<Summary | null>(null);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [showForm, setShowForm] = useState(false);
 
     // Form state
@@ -40,11 +42,12 @@ export default function ProductReviews({ productId }: { productId: number }) {
 
     const fetchData = async () => {
         try {
-            const [revList, revSummary] = await Promise.all([
+            const [revPage, revSummary] = await Promise.all([
                 api.getProductReviews(productId),
                 api.getProductReviewSummary(productId)
             ]);
-            setReviews(revList);
+            setReviews(revPage.reviews);
+            setNextCursor(revPage.nextCursor);
             setSummary(revSummary);
         } catch (err) {
             console.error("Failed to fetch reviews", err);
@@ -53,6 +56,20 @@ export default function ProductReviews({ productId }: { productId: number }) {
         }
     };
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const revPage = await api.getProductReviews(productId, nextCursor);
+            setReviews(prev => [...prev, ...revPage.reviews]);
+            setNextCursor(revPage.nextCursor);
+        } catch (err) {
+            console.error("Failed to fetch more reviews", err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleSubmit = async (e: React.FormEvent) => {
         e.preventDefault();
         if (!token) {
@@ -191,6 +208,18 @@ export default function ProductReviews({ productId }: { productId: number }) {
                     ))
                 )}
             </div>
+
+            {nextCursor && (
+                <div style={{ textAlign: 'center', marginTop: '24px' }}>
+                    <button
+                        onClick={loadMore}
+                        disabled={loadingMore}
+                        style={{ padding: '10px 24px', backgroundColor: 'white', color: '#111827', border: '1px solid #e5e7eb', borderRadius: '10px', fontWeight: '600', cursor: 'pointer', opacity: loadingMore ? 0.7 : 1 }}
+                    >
+                        {loadingMore ? 'Loading...' : 'Load more reviews'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 }
@@ -94,12 +94,14 @@ export const api = {
         return res.json();
     },
 
-    async getOrders(token: string) {
-        const res = await fetch(`${getBaseUrl()}/orders/`, {
+    async getOrders(token: string, cursor?: string | null) {
+        const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+        const res = await fetch(`${getBaseUrl()}/orders/${query}`, {
             headers: { 'Authorization': `Bearer ${token}` },
         });
         if (!res.ok) throw await res.json();
-        return res.json();
+        // The next page's cursor comes back in a header; null on the last page
+        return { orders: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') };
     },
 
     async getOrder(token: string, id: number) {
@@ -111,10 +113,12 @@ export const api = {
     },
 
     // Reviews
-    async getProductReviews(productId: number) {
-        const res = await fetch(`${getBaseUrl()}/reviews/product/${productId}`);
+    async getProductReviews(productId: number, cursor?: string | null) {
+        const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+        const res = await fetch(`${getBaseUrl()}/reviews/product/${productId}${query}`);
         if (!res.ok) throw await res.json();
-        return res.json();
+        // The next page's cursor comes back in a header; null on the last page
+        return { reviews: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') };
     },
 
     async getProductReviewSummary(productId: number) {